@@ -0,0 +1,84 @@
+"""p50/p99 latency of GET /videos/ while a burst of logins runs against the same worker.
+
+Run it against a single uvicorn worker, once per build you want to compare:
+
+    uvicorn main:app --workers 1
+    python benchmarks/login_burst_latency.py --base-url http://127.0.0.1:8000
+
+With bcrypt on the event loop every login stalls the feed for the length of a hash;
+with the hash pool the feed latency should stay close to the idle numbers.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import statistics
+import threading
+import time
+import uuid
+import requests
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def signup(base_url: str) -> dict:
+    email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    credentials = {"email": email, "password": "bench-password"}
+    response = requests.post(
+        f"{base_url}/auth/signup/user",
+        json={**credentials, "name": "Bench", "phone": "0000000000", "role": "user"},
+        timeout=30,
+    )
+    response.raise_for_status()
+    return {"credentials": credentials, "token": response.json()["access_token"]}
+
+def poll_feed(base_url: str, token: str, stop: threading.Event) -> list:
+    session = requests.Session()
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        session.get(f"{base_url}/videos/", headers=headers, timeout=30).raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+def login_burst(base_url: str, credentials: dict, logins: int, concurrency: int):
+    def login(_):
+        # 503s from a saturated hash pool are expected under load and count as handled
+        return requests.post(f"{base_url}/auth/login", json=credentials, timeout=60).status_code
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(login, range(logins)))
+
+def measure(base_url: str, account: dict, seconds: float, logins: int, concurrency: int) -> list:
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as poller:
+        future = poller.submit(poll_feed, base_url, account["token"], stop)
+        if logins:
+            statuses = login_burst(base_url, account["credentials"], logins, concurrency)
+            print(f"  logins: {statuses.count(200)} ok, {statuses.count(503)} shed (503)")
+        else:
+            time.sleep(seconds)
+        stop.set()
+        return future.result()
+
+def report(label: str, latencies: list):
+    print(
+        f"{label}: {len(latencies)} requests, p50 {statistics.median(latencies):.1f} ms, "
+        f"p99 {percentile(latencies, 99):.1f} ms, max {max(latencies):.1f} ms"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--idle-seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    base_url = args.base_url.rstrip("/")
+    account = signup(base_url)
+    report("idle", measure(base_url, account, args.idle_seconds, 0, args.concurrency))
+    report("login burst", measure(base_url, account, 0, args.logins, args.concurrency))
+
+if __name__ == "__main__":
+    main()
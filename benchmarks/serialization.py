@@ -0,0 +1,62 @@
+"""Serialization benchmark: a 1000-video feed through the old and the new response paths.
+
+    python benchmarks/serialization.py --videos 1000
+"""
+from datetime import datetime, timedelta
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import Decimal128, ObjectId  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from utils.serialization import FastJSONResponse, orjson  # noqa: E402
+
+def make_feed(count: int):
+    uploaded = datetime(2024, 1, 1)
+    return [
+        {
+            "_id": ObjectId(),
+            "youtube_id": f"vid{i:08d}",
+            "youtube_url": f"https://www.youtube.com/watch?v=vid{i:08d}",
+            "title": f"Prenatal care, part {i}",
+            "description": "A walkthrough of what to expect at each check-up. " * 8,
+            "category": "pregnancy",
+            "uploaded_by": str(ObjectId()),
+            "upload_date": "2024-01-01T00:00:00Z",
+            "view_count": str(i * 37),
+            "rating": Decimal128(f"{i % 5}.5"),
+            "stats_refreshed_at": uploaded + timedelta(minutes=i),
+            "thumbnail": f"https://i.ytimg.com/vi/vid{i:08d}/hqdefault.jpg",
+            "doctor": {"name": "Dr. Rao", "avatar": "", "verified": True},
+        }
+        for i in range(count)
+    ]
+
+def old_path(videos):
+    # Hand-converted _id, then FastAPI's jsonable_encoder, then the stdlib-backed JSONResponse
+    content = {"videos": [{**video, "_id": str(video["_id"])} for video in videos], "next_cursor": None}
+    return JSONResponse(jsonable_encoder(content, custom_encoder={Decimal128: str})).body
+
+def new_path(videos):
+    return FastJSONResponse({"videos": videos, "next_cursor": None}).body
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--videos", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    videos = make_feed(args.videos)
+    old_ms = min(timeit.repeat(lambda: old_path(videos), number=1, repeat=args.repeat)) * 1000
+    new_ms = min(timeit.repeat(lambda: new_path(videos), number=1, repeat=args.repeat)) * 1000
+    encoder = "orjson" if orjson is not None else "stdlib json"
+    print(f"{args.videos}-video feed, best of {args.repeat}")
+    print(f"  jsonable_encoder + JSONResponse: {old_ms:7.2f} ms")
+    print(f"  FastJSONResponse ({encoder}):    {new_ms:7.2f} ms  ({old_ms / new_ms:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Signup load test: throughput of concurrent signups, and the outcome of a same-email race.
+
+Run it against a server on each build you want to compare:
+
+    uvicorn main:app --workers 1
+    python benchmarks/signup_throughput.py --base-url http://127.0.0.1:8000 --signups 300
+
+Every signup spends most of its time in bcrypt, so throughput tops out near
+HASH_POOL_SIZE / hash time; the database part is one write on the happy path.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import statistics
+import time
+import uuid
+import requests
+
+def signup(base_url: str, email: str) -> tuple:
+    payload = {"email": email, "password": "bench-password", "name": "Bench", "phone": "0000000000", "role": "user"}
+    started = time.perf_counter()
+    response = requests.post(f"{base_url}/auth/signup/user", json=payload, timeout=60)
+    return response.status_code, (time.perf_counter() - started) * 1000
+
+def run_signups(base_url: str, emails: list, concurrency: int) -> tuple:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda email: signup(base_url, email), emails))
+    return results, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--signups", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--race", type=int, default=20, help="concurrent signups sharing one email")
+    args = parser.parse_args()
+    base_url = args.base_url.rstrip("/")
+
+    emails = [f"bench-{uuid.uuid4().hex[:12]}@example.com" for _ in range(args.signups)]
+    results, elapsed = run_signups(base_url, emails, args.concurrency)
+    statuses = [status for status, _ in results]
+    latencies = [latency for _, latency in results]
+    print(
+        f"unique signups: {statuses.count(200)}/{len(emails)} ok, {statuses.count(503)} shed (503), "
+        f"{statuses.count(200) / elapsed:.1f} signups/s, p50 {statistics.median(latencies):.0f} ms"
+    )
+
+    # Exactly one signup per email may win, however many race for it
+    shared = f"bench-race-{uuid.uuid4().hex[:12]}@example.com"
+    results, _ = run_signups(base_url, [shared] * args.race, args.race)
+    statuses = [status for status, _ in results]
+    print(f"same-email race: {statuses.count(200)} created, {statuses.count(400)} rejected as duplicates")
+
+if __name__ == "__main__":
+    main()
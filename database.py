@@ -1,4 +1,11 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from pymongo.monitoring import CommandListener, ConnectionPoolListener
+from contextvars import ContextVar
+from typing import Dict, Optional
+import asyncio
+import logging
 import os
 from dotenv import load_dotenv
 
@@ -7,22 +14,175 @@ load_dotenv()
 
 # MongoDB Connection
 MONGO_URI = os.getenv("MONGO_URI")  # Fetch from .env file
-DB_NAME = "video_streaming"
-
-# Initialize MongoDB Client
-client = AsyncIOMotorClient(MONGO_URI)
-
-#test connection by checking server info
-try:
-    print("Connecting to MongoDB...")
-    client.admin.command('ping')
-    print("Connected to MongoDB")
-    
-except Exception as e:
-    print(f"Error connecting to MongoDB: {str(e)}")
+# Overridable so the test suite runs against its own database
+DB_NAME = os.getenv("MONGO_DB_NAME", "video_streaming")
+
+# Connection pool settings
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "10"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+# Adds per-request DB call counts to responses; for local debugging only
+DEBUG_HEADERS = os.getenv("DEBUG_HEADERS", "false").lower() == "true"
+
+class PoolStatsListener(ConnectionPoolListener):
+    """Counts pool events so /readyz can report live pool usage."""
+
+    def __init__(self):
+        self.stats = {"open": 0, "checked_out": 0, "created": 0, "closed": 0, "checkout_failures": 0}
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.stats["created"] += 1
+        self.stats["open"] += 1
+
+    def connection_closed(self, event):
+        self.stats["closed"] += 1
+        self.stats["open"] -= 1
+
+    def connection_check_out_failed(self, event):
+        self.stats["checkout_failures"] += 1
+
+    def connection_checked_out(self, event):
+        self.stats["checked_out"] += 1
+
+    def connection_checked_in(self, event):
+        self.stats["checked_out"] -= 1
+
+pool_stats_listener = PoolStatsListener()
+
+# Per-request command counter, installed by start_db_call_count(); Motor copies the
+# context into its executor threads, so commands are counted against the right request
+_db_call_counter: ContextVar[Optional[Dict[str, int]]] = ContextVar("db_call_counter", default=None)
+
+class CommandCountListener(CommandListener):
+    """Counts the commands each request sends, for the debug headers."""
+
+    def started(self, event):
+        counter = _db_call_counter.get()
+        if counter is not None:
+            counter["calls"] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+def start_db_call_count() -> Dict[str, int]:
+    """Count every command sent from the current context (and tasks it spawns) from now on."""
+    counter = {"calls": 0}
+    _db_call_counter.set(counter)
+    return counter
+
+# The client connects lazily; connect_database() opens and warms it in the app lifespan
+client = AsyncIOMotorClient(
+    MONGO_URI,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+    connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    # The command counter only runs when something reads it, not on every production command
+    event_listeners=[pool_stats_listener, CommandCountListener()] if DEBUG_HEADERS else [pool_stats_listener],
+    connect=False,
+)
 database = client[DB_NAME]
 
 # Collections
 users_collection = database.get_collection("users")
 doctors_collection = database.get_collection("doctors")
 videos_collection = database.get_collection("videos")
+youtube_metadata_collection = database.get_collection("youtube_metadata")
+# email -> (role, account_id) for every user and doctor, so login needs one indexed lookup
+accounts_collection = database.get_collection("accounts")
+# Watch events bucketed per account per day, see services/history_service.py
+watch_history_collection = database.get_collection("watch_history")
+# Change counters behind the ETags of the feed and watch history endpoints
+versions_collection = database.get_collection("versions")
+# Leases and resume state for background jobs that run on one worker, see services/job_lease.py
+background_jobs_collection = database.get_collection("background_jobs")
+
+logger = logging.getLogger(__name__)
+
+async def connect_database():
+    """Verify MongoDB is reachable and pre-open MONGO_MIN_POOL_SIZE connections.
+
+    Raises if the server cannot be reached, so the worker never starts serving cold.
+    """
+    logger.info("Connecting to MongoDB...")
+    await client.admin.command("ping")
+    # Concurrent pings force the pool to open that many sockets up front
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(MONGO_MIN_POOL_SIZE)))
+    logger.info(f"Connected to MongoDB, pool warmed with {pool_stats_listener.stats['open']} connections")
+
+def close_database():
+    client.close()
+
+async def ping_database() -> bool:
+    try:
+        await client.admin.command("ping")
+        return True
+    except Exception as e:
+        logger.error(f"MongoDB ping failed: {str(e)}")
+        return False
+
+def pool_stats() -> dict:
+    return {"max_pool_size": MONGO_MAX_POOL_SIZE, "min_pool_size": MONGO_MIN_POOL_SIZE, **pool_stats_listener.stats}
+
+# Index registry: every index the queries in routes/ and services/ rely on
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+    ],
+    "doctors": [
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+    ],
+    "accounts": [
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+    ],
+    "videos": [
+        # Catalog listings sort on (upload_date, _id) descending, see services/video_service.py
+        IndexModel([("uploaded_by", ASCENDING), ("upload_date", DESCENDING), ("_id", DESCENDING)], name="uploaded_by_catalog"),
+        IndexModel([("category", ASCENDING), ("upload_date", DESCENDING), ("_id", DESCENDING)], name="category_catalog"),
+        IndexModel([("upload_date", DESCENDING), ("_id", DESCENDING)], name="catalog"),
+        # Partial so legacy videos without a youtube_id don't collide
+        IndexModel(
+            [("youtube_id", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"youtube_id": {"$exists": True}},
+            name="youtube_id_unique",
+        ),
+        # Stalest-first scan for the view-count refresher
+        IndexModel([("stats_refreshed_at", ASCENDING)], name="stats_refreshed_at"),
+    ],
+    "watch_history": [
+        IndexModel([("account_id", ASCENDING), ("bucket", DESCENDING), ("_id", DESCENDING)], name="account_recent"),
+    ],
+}
+
+async def ensure_indexes():
+    """Create any missing index in the registry; existing ones are left untouched."""
+    for collection_name, indexes in INDEXES.items():
+        try:
+            await database[collection_name].create_indexes(indexes)
+        except OperationFailure as e:
+            logger.error(f"Failed to create indexes on {collection_name}: {str(e)}")
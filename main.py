@@ -1,13 +1,44 @@
 from fastapi import FastAPI, Response, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
+from database import connect_database, close_database, ping_database, pool_stats, ensure_indexes, start_db_call_count, DEBUG_HEADERS
 from routes.auth_routes import router as auth_router
 from routes.video_routes import router as video_router
 from routes.youtube_routes import router as youtube_router
+from routes.export_routes import router as export_router
+from utils.security import hash_pool_stats, token_cache_stats
+from services.youtube_service import metadata_cache_stats
+from services.history_service import start_history_writer, stop_history_writer, write_behind_stats
+from services.video_service import start_doctor_summary_propagator, stop_doctor_summary_propagator
+from services.view_count_service import start_view_count_refresher, stop_view_count_refresher, view_count_refresh_stats
+from services.feed_cache import feed_cache_stats
+from utils.serialization import FastJSONResponse
+import logging
 
 load_dotenv()
+logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Video Streaming Platform")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open and warm the Mongo pool so the first requests don't pay connection setup
+    await connect_database()
+    # Make sure hot queries are index-backed before serving traffic
+    await ensure_indexes()
+    start_history_writer()
+    start_doctor_summary_propagator()
+    start_view_count_refresher()
+    app.state.ready = True
+    yield
+    app.state.ready = False
+    await stop_view_count_refresher()
+    await stop_doctor_summary_propagator()
+    # Drain buffered watch events before the pool goes away
+    await stop_history_writer()
+    close_database()
+
+app = FastAPI(title="Video Streaming Platform", lifespan=lifespan, default_response_class=FastJSONResponse)
 
 # CORS Configuration
 origins = [
@@ -25,10 +56,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if DEBUG_HEADERS:
+    @app.middleware("http")
+    async def db_call_headers(request: Request, call_next):
+        counter = start_db_call_count()
+        response = await call_next(request)
+        loaders = getattr(request.state, "account_loaders", None)
+        # Every command the request sent, and the account loader's share of them
+        response.headers["X-DB-Calls"] = str(counter["calls"])
+        response.headers["X-Account-DB-Calls"] = str(loaders.db_calls if loaders else 0)
+        return response
+
 # Include API Routes
 app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
 app.include_router(video_router, prefix="/videos", tags=["Videos"])
 app.include_router(youtube_router, prefix="/youtube", tags=["YouTube"])
+app.include_router(export_router, prefix="/exports", tags=["Exports"])
 
 # Root Endpoint with Access-Control Headers
 @app.get("/")
@@ -37,4 +80,32 @@ def home(request: Request, response: Response):
     response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
     response.headers["Access-Control-Allow-Headers"] = "*"
     
-    return {"message": "Welcome to the Video Streaming API!"}
\ No newline at end of file
+    return {"message": "Welcome to the Video Streaming API!"}
+
+
+# Liveness: the process is up and serving
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+# Readiness: startup finished and MongoDB answers a ping
+@app.get("/readyz")
+async def readyz(request: Request):
+    ready = getattr(request.app.state, "ready", False) and await ping_database()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "unavailable", "mongo_pool": pool_stats()},
+    )
+
+# Runtime metrics for the worker pools and caches
+@app.get("/metrics")
+async def metrics():
+    return {
+        "mongo_pool": pool_stats(),
+        "hash_pool": hash_pool_stats(),
+        "token_cache": token_cache_stats(),
+        "youtube_metadata_cache": metadata_cache_stats(),
+        "watch_history_write_behind": write_behind_stats(),
+        "view_count_refresher": view_count_refresh_stats(),
+        "feed_cache": feed_cache_stats(),
+    }
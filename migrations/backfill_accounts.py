@@ -0,0 +1,70 @@
+"""Backfill the accounts index from the users and doctors collections.
+
+Safe to re-run: existing entries are left alone. Walks each collection in _id order
+in batches so it never holds more than one batch in memory.
+
+    python -m migrations.backfill_accounts --batch-size 500
+"""
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from database import accounts_collection, ensure_indexes
+from services.auth_service import ACCOUNT_COLLECTIONS
+import argparse
+import asyncio
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def backfill_role(role: str, batch_size: int) -> dict:
+    collection = ACCOUNT_COLLECTIONS[role]
+    counts = {"scanned": 0, "inserted": 0, "conflicts": 0}
+    last_id = None
+
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id else {}
+        batch = await collection.find(query, {"email": 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+        counts["scanned"] += len(batch)
+
+        operations = [
+            UpdateOne(
+                {"email": doc["email"]},
+                {"$setOnInsert": {"role": role, "account_id": doc["_id"]}},
+                upsert=True,
+            )
+            for doc in batch
+            if doc.get("email")
+        ]
+        if not operations:
+            continue
+        try:
+            result = await accounts_collection.bulk_write(operations, ordered=False)
+            counts["inserted"] += result.upserted_count
+        except BulkWriteError as e:
+            # Concurrent signups can race the upsert; those emails are already indexed
+            counts["inserted"] += e.details.get("nUpserted", 0)
+
+        # Emails registered under both roles keep whichever role was indexed first
+        emails = [doc["email"] for doc in batch if doc.get("email")]
+        async for account in accounts_collection.find({"email": {"$in": emails}, "role": {"$ne": role}}, {"email": 1}):
+            counts["conflicts"] += 1
+            logger.warning(f"Email {account['email']} is also registered as a {role}; login resolves it to the other role")
+
+        logger.info(f"{role}: scanned {counts['scanned']}, inserted {counts['inserted']}")
+
+    return counts
+
+async def main(batch_size: int):
+    await ensure_indexes()
+    for role in ACCOUNT_COLLECTIONS:
+        counts = await backfill_role(role, batch_size)
+        logger.info(f"Finished {role}: {counts}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size))
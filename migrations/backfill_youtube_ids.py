@@ -0,0 +1,66 @@
+"""Set youtube_id and a canonical youtube_url on videos stored before deduplication.
+
+Videos whose URL cannot be parsed, or whose YouTube ID is already taken by another
+document, are left untouched and reported so they can be merged by hand.
+
+    python -m migrations.backfill_youtube_ids --batch-size 500
+"""
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from database import videos_collection, ensure_indexes
+from services.youtube_service import extract_video_id, canonical_url
+import argparse
+import asyncio
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def main(batch_size: int):
+    await ensure_indexes()
+    counts = {"scanned": 0, "updated": 0, "invalid": 0, "duplicates": 0}
+    last_id = None
+
+    while True:
+        query = {"youtube_id": {"$exists": False}}
+        if last_id:
+            query["_id"] = {"$gt": last_id}
+        batch = await videos_collection.find(query, {"youtube_url": 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+        counts["scanned"] += len(batch)
+
+        operations = []
+        for video in batch:
+            try:
+                youtube_id = extract_video_id(video.get("youtube_url") or "")
+            except ValueError:
+                counts["invalid"] += 1
+                logger.warning(f"Video {video['_id']} has an unrecognised URL: {video.get('youtube_url')}")
+                continue
+            operations.append(UpdateOne(
+                {"_id": video["_id"]},
+                {"$set": {"youtube_id": youtube_id, "youtube_url": canonical_url(youtube_id)}},
+            ))
+        if not operations:
+            continue
+
+        try:
+            result = await videos_collection.bulk_write(operations, ordered=False)
+            counts["updated"] += result.modified_count
+        except BulkWriteError as e:
+            counts["updated"] += e.details.get("nModified", 0)
+            for error in e.details.get("writeErrors", []):
+                counts["duplicates"] += 1
+                logger.warning(f"Duplicate YouTube video, not updated: {error.get('op', {}).get('q')}")
+
+        logger.info(f"Scanned {counts['scanned']}, updated {counts['updated']}")
+
+    logger.info(f"Finished: {counts}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size))
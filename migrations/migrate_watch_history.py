@@ -0,0 +1,88 @@
+"""Move embedded watch_history arrays into the bucketed watch_history collection.
+
+The embedded arrays carry no timestamps, so entries get synthetic ones one second
+apart that preserve their order. They are dated just before the account's earliest
+bucket, so events recorded since the deploy keep ranking above the old history.
+Each account's old history becomes one bucket marked `migrated`, written at most once,
+and the array is removed afterwards, so the script can be stopped and re-run.
+
+    python -m migrations.migrate_watch_history --batch-size 200
+"""
+from pymongo import UpdateOne
+from database import watch_history_collection, ensure_indexes
+from services.auth_service import ACCOUNT_COLLECTIONS
+from services.history_service import bucket_start, make_entry
+from bson import ObjectId
+from datetime import datetime, timedelta
+from typing import Dict, List
+import argparse
+import asyncio
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def earliest_buckets(account_ids: List[ObjectId]) -> Dict[ObjectId, datetime]:
+    """Start of each account's oldest existing bucket, for accounts that have any."""
+    pipeline = [
+        {"$match": {"account_id": {"$in": account_ids}}},
+        {"$group": {"_id": "$account_id", "bucket": {"$min": "$bucket"}}},
+    ]
+    return {row["_id"]: row["bucket"] async for row in watch_history_collection.aggregate(pipeline)}
+
+async def migrate_role(role: str, batch_size: int) -> int:
+    collection = ACCOUNT_COLLECTIONS[role]
+    migrated = 0
+
+    while True:
+        # Migrated accounts lose the field, so the same query always yields the next batch
+        batch = await collection.find(
+            {"watch_history": {"$exists": True}}, {"watch_history": 1}
+        ).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+
+        migrated_at = datetime.utcnow()
+        earliest = await earliest_buckets([account["_id"] for account in batch])
+        buckets = []
+        for account in batch:
+            watch_history = account["watch_history"] if isinstance(account["watch_history"], list) else []
+            if not watch_history:
+                continue
+            # Older than anything already in the new store, which only holds post-deploy events
+            newest_at = earliest[account["_id"]] - timedelta(seconds=1) if account["_id"] in earliest else migrated_at
+            # The array is newest first; buckets store entries oldest first
+            entries = [
+                make_entry(video_id, newest_at - timedelta(seconds=index))
+                for index, video_id in reversed(list(enumerate(watch_history)))
+            ]
+            # Keyed on the account alone, so a re-run after a crash before the $unset below
+            # finds the bucket it already wrote and leaves it untouched instead of duplicating it
+            buckets.append(UpdateOne(
+                {"account_id": account["_id"], "migrated": True},
+                {"$setOnInsert": {"bucket": bucket_start(newest_at), "count": len(entries), "entries": entries}},
+                upsert=True,
+            ))
+
+        if buckets:
+            await watch_history_collection.bulk_write(buckets, ordered=False)
+        await collection.bulk_write(
+            [UpdateOne({"_id": account["_id"]}, {"$unset": {"watch_history": ""}}) for account in batch],
+            ordered=False,
+        )
+        migrated += len(batch)
+        logger.info(f"{role}: migrated {migrated} accounts")
+
+    return migrated
+
+async def main(batch_size: int):
+    await ensure_indexes()
+    for role in ACCOUNT_COLLECTIONS:
+        migrated = await migrate_role(role, batch_size)
+        logger.info(f"Finished {role}: {migrated} accounts")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size))
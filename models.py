@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 
 # User Schema
 class UserCreate(BaseModel):
@@ -30,4 +30,10 @@ class VideoCreate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
     category: str  # 'Postpartum', 'Preconception', 'Pregnancy'
-    thumbnail: Optional[str] = None  # URL or file path for thumbnail
\ No newline at end of file
+    thumbnail: Optional[str] = None  # URL or file path for thumbnail
+
+# Bulk import of many YouTube videos into one category
+class VideoBulkCreate(BaseModel):
+    youtube_urls: List[str] = Field(..., min_length=1, max_length=500)
+    category: str  # 'Postpartum', 'Preconception', 'Pregnancy'
+    description: Optional[str] = None  # Overrides the YouTube description for every video
@@ -1,10 +1,17 @@
-from fastapi import APIRouter, HTTPException, Body, Depends
+from fastapi import APIRouter, HTTPException, Body, Depends, Request, Response
 from pydantic import BaseModel, ValidationError
-from utils.security import hash_password, verify_password, create_jwt_token, get_current_user
+from utils.security import hash_password_async, verify_password_async, create_jwt_token, get_current_user
 from database import users_collection, doctors_collection
-from datetime import timedelta
+from services.auth_service import (
+    create_account, find_account_by_email,
+    include_history, LOGIN_FIELDS,
+)
+from services.history_service import record_watch_event, recent_watch_history, recent_video_ids, pending_marker
+from services.version_service import request_etag, etag_matches, not_modified, history_version_key, CATALOG_VERSION
+from services.video_service import find_videos_by_ids
+from datetime import datetime, timedelta
 from typing import List, Optional  # Added Optional here
-from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 from fastapi.security import OAuth2PasswordBearer
 import logging
 
@@ -52,17 +59,21 @@ class UserResponseWithToken(BaseModel):
 class WatchHistoryRequest(BaseModel):
     user_id: str  # Ensure this is a non-empty string
     video_id: str  # Ensure this is a non-empty string
+    position: Optional[float] = None  # Playback position in seconds
 
 class WatchHistoryResponse(BaseModel):
     video_id: str
+    watched_at: Optional[datetime] = None
+    position: Optional[float] = None
+    video: Optional[dict] = None  # Only with ?expand=videos
+
+# Video fields returned with each entry by GET /watch-history?expand=videos
+HISTORY_VIDEO_PROJECTION = {"title": 1, "thumbnail": 1, "category": 1, "upload_date": 1, "view_count": 1, "youtube_url": 1}
 
 @router.post("/signup/user", response_model=UserResponseWithToken)
 async def signup_user(user_data: UserSignupRequest):
-    existing_user = await users_collection.find_one({"email": user_data.email})
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    hashed_password = hash_password(user_data.password)
+    # Duplicate emails, under either role, are rejected by the unique accounts index
+    hashed_password = await hash_password_async(user_data.password)
     new_user = {
         "email": user_data.email,
         "password": hashed_password,
@@ -70,23 +81,24 @@ async def signup_user(user_data: UserSignupRequest):
         "phone": user_data.phone,
         "deliveryStatus": user_data.deliveryStatus,
         "role": "user",
-        "watch_history": []  # Explicitly initialize as an empty list
     }
     
     try:
-        result = await users_collection.insert_one(new_user)
-        logger.info(f"User created with ID: {result.inserted_id}, watch_history: {new_user['watch_history']}")
+        account_id = await create_account("user", new_user)
+        logger.info(f"User created with ID: {account_id}")
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email already registered")
     except Exception as e:
         logger.error(f"Failed to insert user: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to create user: {str(e)}")
     
     access_token = create_jwt_token(
-        data={"user_id": str(result.inserted_id), "role": "user"},
+        data={"user_id": str(account_id), "role": "user"},
         expires_delta=timedelta(hours=1)
     )
     
     return UserResponseWithToken(
-        id=str(result.inserted_id),
+        id=str(account_id),
         email=user_data.email,
         name=user_data.name,
         phone=user_data.phone,
@@ -99,11 +111,8 @@ async def signup_user(user_data: UserSignupRequest):
 
 @router.post("/signup/doctor", response_model=UserResponseWithToken)
 async def signup_doctor(doctor_data: DoctorSignupRequest):
-    existing_doctor = await doctors_collection.find_one({"email": doctor_data.email})
-    if existing_doctor:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    hashed_password = hash_password(doctor_data.password)
+    # Duplicate emails, under either role, are rejected by the unique accounts index
+    hashed_password = await hash_password_async(doctor_data.password)
     new_doctor = {
         "email": doctor_data.email,
         "password": hashed_password,
@@ -114,23 +123,24 @@ async def signup_doctor(doctor_data: DoctorSignupRequest):
         "clinicName": doctor_data.clinicName,
         "motherhoodStage": doctor_data.motherhoodStage,
         "role": "doctor",
-        "watch_history": []  # Explicitly initialize as an empty list
     }
     
     try:
-        result = await doctors_collection.insert_one(new_doctor)
-        logger.info(f"Doctor created with ID: {result.inserted_id}, watch_history: {new_doctor['watch_history']}")
+        account_id = await create_account("doctor", new_doctor)
+        logger.info(f"Doctor created with ID: {account_id}")
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email already registered")
     except Exception as e:
         logger.error(f"Failed to insert doctor: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to create doctor: {str(e)}")
     
     access_token = create_jwt_token(
-        data={"user_id": str(result.inserted_id), "role": "doctor"},
+        data={"user_id": str(account_id), "role": "doctor"},
         expires_delta=timedelta(hours=1)
     )
     
     return UserResponseWithToken(
-        id=str(result.inserted_id),
+        id=str(account_id),
         email=doctor_data.email,
         name=doctor_data.name,
         phone=doctor_data.phone,
@@ -144,57 +154,61 @@ async def signup_doctor(doctor_data: DoctorSignupRequest):
         token_type="bearer"
     )
 
-@router.post("/login/user")
-async def login_user(user_data: dict = Body(...)):
-    email = user_data.get("email")
-    password = user_data.get("password")
-    
-    user = await users_collection.find_one({"email": email})
-    if not user or not verify_password(password, user["password"]):
-        raise HTTPException(status_code=400, detail="Invalid email or password")
-    
+async def build_login_response(account: dict, role: str, include: Optional[str]) -> dict:
     access_token = create_jwt_token(
-        data={"user_id": str(user["_id"]), "role": "user"},
+        data={"user_id": str(account["_id"]), "role": role},
         expires_delta=timedelta(hours=1)
     )
     
+    user = {
+        "id": str(account["_id"]),
+        "email": account["email"],
+        "name": account["name"],
+        "role": role,
+    }
+    if include_history(include):
+        user["watch_history"] = await recent_video_ids(str(account["_id"]))
+    
     return {
         "access_token": access_token,
         "token_type": "bearer",
-        "user": {
-            "id": str(user["_id"]),
-            "email": user["email"],
-            "name": user["name"],
-            "role": "user",
-            "watch_history": user.get("watch_history", [])  # Ensure watch_history is returned
-        }
+        "user": user
     }
 
+@router.post("/login/user")
+async def login_user(user_data: dict = Body(...), include: Optional[str] = None):
+    email = user_data.get("email")
+    password = user_data.get("password")
+    
+    # Only the credential fields; watch history is fetched from its own store when included
+    user = await users_collection.find_one({"email": email}, LOGIN_FIELDS)
+    if not user or not await verify_password_async(password, user["password"]):
+        raise HTTPException(status_code=400, detail="Invalid email or password")
+    
+    return await build_login_response(user, "user", include)
+
 @router.post("/login/doctor")
-async def login_doctor(user_data: dict = Body(...)):
+async def login_doctor(user_data: dict = Body(...), include: Optional[str] = None):
     email = user_data.get("email")
     password = user_data.get("password")
     
-    doctor = await doctors_collection.find_one({"email": email})
-    if not doctor or not verify_password(password, doctor["password"]):
+    doctor = await doctors_collection.find_one({"email": email}, LOGIN_FIELDS)
+    if not doctor or not await verify_password_async(password, doctor["password"]):
         raise HTTPException(status_code=400, detail="Invalid email or password")
     
-    access_token = create_jwt_token(
-        data={"user_id": str(doctor["_id"]), "role": "doctor"},
-        expires_delta=timedelta(hours=1)
-    )
+    return await build_login_response(doctor, "doctor", include)
+
+@router.post("/login")
+async def login(user_data: dict = Body(...), include: Optional[str] = None):
+    email = user_data.get("email")
+    password = user_data.get("password")
     
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "user": {
-            "id": str(doctor["_id"]),
-            "email": doctor["email"],
-            "name": doctor["name"],
-            "role": "doctor",
-            "watch_history": doctor.get("watch_history", [])  # Ensure watch_history is returned
-        }
-    }
+    # One indexed lookup resolves the email to its role and profile
+    account = await find_account_by_email(email, LOGIN_FIELDS)
+    if not account or not await verify_password_async(password, account["password"]):
+        raise HTTPException(status_code=400, detail="Invalid email or password")
+    
+    return await build_login_response(account, account["role"], include)
 
 @router.post("/watch-history", response_model=WatchHistoryResponse)
 async def update_watch_history(history: WatchHistoryRequest, user: dict = Depends(get_current_user)):
@@ -210,37 +224,17 @@ async def update_watch_history(history: WatchHistoryRequest, user: dict = Depend
         if not video_id or not isinstance(video_id, str) or video_id.strip() == "":
             raise HTTPException(status_code=422, detail="Invalid or empty video_id")
         
-        collection = users_collection if user["role"] == "user" else doctors_collection
-        
-        # Verify user exists and fetch the current document
-        user_doc = await collection.find_one({"_id": ObjectId(user_id)})
-        if not user_doc:
-            logger.error(f"User not found for user_id: {user_id}")
-            raise HTTPException(status_code=404, detail="User not found")
+        if user_id != user["user_id"]:
+            raise HTTPException(status_code=403, detail="Cannot update another user's watch history")
         
-        # Ensure watch_history is an array, handle any non-array values
-        current_watch_history = user_doc.get("watch_history", [])
-        if not isinstance(current_watch_history, list):
-            await collection.update_one(
-                {"_id": ObjectId(user_id)},
-                {"$set": {"watch_history": []}}
-            )
-            logger.info(f"Reset watch_history to empty array for user_id: {user_id} due to non-array value")
-            current_watch_history = []
+        # One upsert into the account's current history bucket
+        await record_watch_event(user_id, video_id, history.position)
+        logger.info(f"Updated watch history for user_id: {user_id}, head: {video_id}")
         
-        # Update watch_history atomically to avoid conflicts
-        new_watch_history = [video_id] + [vid for vid in current_watch_history if vid != video_id]
-        if len(new_watch_history) > 50:
-            new_watch_history = new_watch_history[:50]  # Limit to 50 entries
-        
-        result = await collection.update_one(
-            {"_id": ObjectId(user_id)},
-            {"$set": {"watch_history": new_watch_history}}
-        )
-        logger.info(f"Update result: {result.modified_count} documents modified, new watch_history: {new_watch_history}")
-        
-        return WatchHistoryResponse(video_id=video_id)
+        return WatchHistoryResponse(video_id=video_id, position=history.position)
     
+    except HTTPException:
+        raise
     except ValidationError as ve:
         logger.error(f"Validation error in watch history request: {str(ve)}")
         raise HTTPException(status_code=422, detail=str(ve.errors()))
@@ -248,15 +242,32 @@ async def update_watch_history(history: WatchHistoryRequest, user: dict = Depend
         logger.error(f"Error updating watch history: {str(e)}, full error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to update watch history: {str(e)}")
 
-@router.get("/watch-history", response_model=List[WatchHistoryResponse])
-async def get_watch_history(user: dict = Depends(get_current_user)):
+@router.get("/watch-history", response_model=List[WatchHistoryResponse], response_model_exclude_none=True)
+async def get_watch_history(
+    request: Request,
+    response: Response,
+    expand: Optional[str] = None,
+    user: dict = Depends(get_current_user),
+):
     user_id = user["user_id"]
-    collection = users_collection if user["role"] == "user" else doctors_collection
     
-    user_data = await collection.find_one({"_id": ObjectId(user_id)})
-    if not user_data:
-        raise HTTPException(status_code=404, detail="User not found")
+    # Expanded entries also change when a referenced video is deleted
+    keys = [history_version_key(user_id)] + ([CATALOG_VERSION] if expand == "videos" else [])
+    etag, _ = await request_etag(request, user, keys, pending_marker(user_id))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    
+    watch_history = await recent_watch_history(user_id)
+    logger.info(f"Fetched watch history for user_id: {user_id}, entries: {len(watch_history)}")
+    
+    if expand != "videos":
+        return [WatchHistoryResponse(**entry) for entry in watch_history]
     
-    watch_history = user_data.get("watch_history", [])
-    logger.info(f"Fetched watch history for user_id: {user_id}, history: {watch_history}")
-    return [WatchHistoryResponse(video_id=video_id) for video_id in watch_history]
\ No newline at end of file
+    # One $in query for every referenced video; deleted videos drop out, history order is kept
+    videos = await find_videos_by_ids([entry["video_id"] for entry in watch_history], HISTORY_VIDEO_PROJECTION)
+    return [
+        WatchHistoryResponse(**entry, video=videos[entry["video_id"]])
+        for entry in watch_history
+        if entry["video_id"] in videos
+    ]
@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from utils.security import get_current_user
+from services.export_service import stream_videos_ndjson, stream_videos_csv, stream_videos_bson
+import logging
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+# Comma-separated account IDs allowed to pull full catalog exports
+EXPORT_ALLOWED_USER_IDS = {
+    user_id.strip() for user_id in os.getenv("EXPORT_ALLOWED_USER_IDS", "").split(",") if user_id.strip()
+}
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+EXPORT_FORMATS = {
+    "ndjson": (stream_videos_ndjson, "application/x-ndjson", "videos.ndjson"),
+    "csv": (stream_videos_csv, "text/csv; charset=utf-8", "videos.csv"),
+    # Raw BSON straight off the cursor, for restores and analytics jobs that read BSON
+    "bson": (stream_videos_bson, "application/bson", "videos.bson"),
+}
+
+# Stream the whole video catalog for admin and analytics jobs
+@router.get("/videos")
+async def export_videos(
+    format: str = Query("ndjson", pattern="^(ndjson|csv|bson)$"),
+    user: dict = Depends(get_current_user),
+):
+    if user["user_id"] not in EXPORT_ALLOWED_USER_IDS:
+        raise HTTPException(status_code=403, detail="Unauthorized to export the catalog")
+
+    stream, media_type, filename = EXPORT_FORMATS[format]
+    logger.info(f"Catalog export started by {user['user_id']}: format={format}")
+    return StreamingResponse(
+        stream(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
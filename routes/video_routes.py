@@ -1,110 +1,130 @@
-from fastapi import APIRouter, Depends, HTTPException
-from models import VideoCreate
-from database import videos_collection, users_collection, doctors_collection
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from models import VideoCreate, VideoBulkCreate
+from database import videos_collection
 from utils.security import get_current_user
+from services.auth_service import AccountLoaders, get_account_loaders
+from services.history_service import recent_video_ids, pending_marker
+from services.feed_cache import get_feed_page, render_feed
+from utils.serialization import FastJSONResponse, dumps
+from services.version_service import (
+    request_etag, etag_matches, not_modified, bump_versions, history_version_key, CATALOG_VERSION,
+)
+from services.video_service import (
+    find_videos_page, catalog_query, parse_fields, build_projection, rank_feed, create_video, attach_doctor_summaries,
+    import_videos, find_watched_videos,
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, VIDEO_FIELDS, RANKING_FIELDS,
+)
 from bson import ObjectId
-from typing import List, Dict
-import requests
-import os
-from dotenv import load_dotenv
+from typing import Optional
 
 router = APIRouter()
 
-# Load environment variables
-load_dotenv()
-YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
-YOUTUBE_API_URL = "https://www.googleapis.com/youtube/v3/videos"
-
-# Extract video ID from YouTube URL
-def extract_video_id(youtube_url: str) -> str:
-    if "youtu.be/" in youtube_url:
-        return youtube_url.split("youtu.be/")[-1].split("?")[0]
-    elif "youtube.com/watch?v=" in youtube_url:
-        return youtube_url.split("watch?v=")[-1].split("&")[0]
-    raise ValueError("Invalid YouTube URL format")
-
-# Fetch video metadata from YouTube API
-def fetch_youtube_metadata(youtube_url: str) -> Dict:
-    try:
-        video_id = extract_video_id(youtube_url)
-        response = requests.get(
-            YOUTUBE_API_URL,
-            params={"part": "snippet,statistics", "id": video_id, "key": YOUTUBE_API_KEY},
-        )
-        data = response.json()
-
-        if "items" not in data or not data["items"]:
-            raise HTTPException(status_code=404, detail="YouTube video not found")
-
-        video_info = data["items"][0]
-        metadata = {
-            "title": video_info["snippet"]["title"],
-            "description": video_info["snippet"]["description"],
-            "upload_date": video_info["snippet"]["publishedAt"],
-            "view_count": video_info["statistics"].get("viewCount", "N/A"),
-            "thumbnail": video_info["snippet"]["thumbnails"]["high"]["url"],
-            "youtube_url": youtube_url,
-        }
-        return metadata
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching metadata: {str(e)}")
-
 # Upload a new YouTube video
 @router.post("/")
-async def upload_video(video: VideoCreate, user: dict = Depends(get_current_user)):
+async def upload_video(
+    video: VideoCreate,
+    user: dict = Depends(get_current_user),
+    loaders: AccountLoaders = Depends(get_account_loaders),
+):
     if user["role"] != "doctor":
         raise HTTPException(status_code=403, detail="Only doctors can upload videos")
 
-    youtube_metadata = fetch_youtube_metadata(video.youtube_url)
-    video_data = {
-        "youtube_url": video.youtube_url,
-        "title": youtube_metadata["title"],
-        "description": video.description if video.description else youtube_metadata["description"],
-        "category": video.category,
-        "uploaded_by": user["user_id"],
-        "upload_date": youtube_metadata["upload_date"],
-        "view_count": youtube_metadata["view_count"],
-        "thumbnail": youtube_metadata["thumbnail"],
-    }
-    result = await videos_collection.insert_one(video_data)
-    video_data["_id"] = str(result.inserted_id)
+    video_data, created = await create_video(video, user, loaders)
     return {
-        "message": "Video uploaded successfully",
+        "message": "Video uploaded successfully" if created else "Video already exists",
         "video": video_data
     }
 
+# Import many YouTube videos at once, e.g. a whole playlist
+@router.post("/bulk")
+async def bulk_upload_videos(
+    bulk: VideoBulkCreate,
+    user: dict = Depends(get_current_user),
+    loaders: AccountLoaders = Depends(get_account_loaders),
+):
+    if user["role"] != "doctor":
+        raise HTTPException(status_code=403, detail="Only doctors can upload videos")
+
+    results = await import_videos(bulk, user, loaders)
+    return {
+        "created": sum(1 for row in results if row["status"] == "created"),
+        "results": results
+    }
+
 # Get all videos with watch history-based recommendations
 @router.get("/")
-async def get_videos(user: dict = Depends(get_current_user)):
+async def get_videos(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    category: Optional[str] = None,
+    fields: Optional[str] = None,
+    order: str = "newest",
+    user: dict = Depends(get_current_user),
+    loaders: AccountLoaders = Depends(get_account_loaders),
+):
     try:
-        # Fetch videos based on user role
+        # Answer polling clients from the version counters before touching the catalog
         if user["role"] == "doctor":
-            # Doctors see only their videos
-            videos = await videos_collection.find({"uploaded_by": user["user_id"]}).to_list(1000)
+            etag, versions = await request_etag(request, user, [CATALOG_VERSION])
         else:
-            # Users see all videos
-            videos = await videos_collection.find().to_list(1000)
-
-        # Convert `_id` to string for all videos
-        formatted_videos = [{**video, "_id": str(video["_id"])} for video in videos]
-
-        # If user is not a doctor, sort based on watch history
-        if user["role"] != "doctor":
-            # Fetch user's watch history
-            user_data = await users_collection.find_one({"_id": ObjectId(user["user_id"])})
-            if not user_data:
-                raise HTTPException(status_code=404, detail="User not found")
-            
-            watch_history = user_data.get("watch_history", [])
-            # Sort videos: watched videos come first
-            formatted_videos.sort(
-                key=lambda x: -1 if x["_id"] in watch_history else 0
+            history_key = history_version_key(user["user_id"])
+            etag, versions = await request_etag(request, user, [CATALOG_VERSION, history_key], pending_marker(user["user_id"]))
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        response.headers["ETag"] = etag
+
+        selected_fields = parse_fields(fields, VIDEO_FIELDS)
+        # The doctor summary falls back to the uploader's profile on legacy videos
+        projected_fields = [*selected_fields, "uploaded_by"] if "doctor" in selected_fields else selected_fields
+
+        def format_video(video: dict) -> dict:
+            # Convert `_id` to string and keep only the requested fields
+            return {"_id": str(video["_id"]), **{field: video[field] for field in selected_fields if field in video}}
+
+        async def build_page():
+            # Doctors see only their videos, users see all videos; one keyset page at a time.
+            # The ranking fields are always read so ordering still works when `fields=` leaves them out
+            videos, next_cursor = await find_videos_page(
+                catalog_query(user, category), limit, cursor, build_projection([*projected_fields, *RANKING_FIELDS])
+            )
+            if "doctor" in selected_fields:
+                await attach_doctor_summaries(videos, loaders)
+            for video in videos:
+                video["_id"] = str(video["_id"])
+            return [(video, format_video(video)) for video in videos], next_cursor
+
+        if user["role"] == "doctor":
+            videos, next_cursor = await build_page()
+            return FastJSONResponse(
+                {"videos": [formatted for _, formatted in videos], "next_cursor": next_cursor}, headers={"ETag": etag}
             )
 
-        return formatted_videos
+        # Users share one pre-encoded base page per catalog version and query
+        page_key = ("videos", versions[CATALOG_VERSION], category, cursor, limit, tuple(selected_fields))
+        page = await get_feed_page(page_key, build_page)
+
+        # Watched videos lead the first page by recency wherever they sit in the catalog and are
+        # left out of later pages; so page 1 can hold up to 50 watched videos on top of `limit`
+        watch_history = await recent_video_ids(user["user_id"])
+        watched_videos = await find_watched_videos(
+            watch_history, catalog_query(user, category), build_projection([*projected_fields, *RANKING_FIELDS])
+        )
+        if "doctor" in selected_fields:
+            await attach_doctor_summaries(watched_videos, loaders)
+        encoded = {video["_id"]: data for video, data in page.items}
+        ranked = rank_feed([video for video, _ in page.items], watched_videos, order, first_page=cursor is None)
+        return Response(
+            content=render_feed(
+                [encoded.get(video["_id"]) or dumps(format_video(video)) for video in ranked], page.next_cursor
+            ),
+            media_type="application/json",
+            headers={"ETag": etag},
+        )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving videos: {str(e)}")
 
@@ -124,5 +144,6 @@ async def delete_video(video_id: str, user: dict = Depends(get_current_user)):
 
     # Delete the video
     await videos_collection.delete_one({"_id": ObjectId(video_id)})
+    await bump_versions([CATALOG_VERSION])
 
     return {"message": "Video deleted successfully"}
\ No newline at end of file
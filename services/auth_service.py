@@ -0,0 +1,120 @@
+from fastapi import Request
+from database import users_collection, doctors_collection, accounts_collection
+from bson import ObjectId
+from typing import Dict, Iterable, List, Optional
+import asyncio
+
+ACCOUNT_COLLECTIONS = {"user": users_collection, "doctor": doctors_collection}
+
+# Everything login needs to check the password and build its response
+LOGIN_FIELDS = {"email": 1, "name": 1, "password": 1}
+
+def include_history(include: Optional[str]) -> bool:
+    """True when `include=history` was requested, e.g. `?include=history`."""
+    return bool(include) and "history" in [part.strip() for part in include.split(",")]
+
+def account_collection(role: str):
+    """Collection holding the profiles for the given role."""
+    return ACCOUNT_COLLECTIONS[role]
+
+async def create_account(role: str, document: Dict) -> ObjectId:
+    """Claim the email in the accounts index, then insert the role-specific profile.
+
+    Raises DuplicateKeyError when the email is already registered under any role.
+    """
+    account_id = ObjectId()
+    await accounts_collection.insert_one({"email": document["email"], "role": role, "account_id": account_id})
+    try:
+        await account_collection(role).insert_one({**document, "_id": account_id})
+    except Exception:
+        # Release the email so a failed signup can be retried
+        await accounts_collection.delete_one({"email": document["email"], "account_id": account_id})
+        raise
+    return account_id
+
+async def find_account_by_email(email: str, projection: Optional[Dict] = None) -> Optional[Dict]:
+    """Resolve an email to its profile through the accounts index, whatever the role."""
+    account = await accounts_collection.find_one({"email": email}, {"_id": 0, "role": 1, "account_id": 1})
+    if not account:
+        return None
+    profile = await account_collection(account["role"]).find_one({"_id": account["account_id"]}, projection)
+    if not profile:
+        return None
+    return {**profile, "role": account["role"]}
+
+# Profile fields never handed out by the loader
+ACCOUNT_LOADER_PROJECTION = {"password": 0}
+
+class AccountLoader:
+    """DataLoader-style account lookups for one request and one role.
+
+    Every load() issued in the same event-loop tick is sent as a single $in query,
+    and each account is fetched at most once per request.
+    """
+
+    def __init__(self, role: str):
+        self.collection = account_collection(role)
+        self.db_calls = 0
+        self._results: Dict[str, asyncio.Future] = {}
+        self._queue: List[str] = []
+
+    def load(self, account_id: str) -> "asyncio.Future":
+        future = self._results.get(account_id)
+        if future is not None:
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._results[account_id] = future
+        self._queue.append(account_id)
+        if len(self._queue) == 1:
+            # Let the rest of this tick queue up before dispatching the batch
+            loop.call_soon(lambda: asyncio.ensure_future(self._dispatch()))
+        return future
+
+    async def load_many(self, account_ids: Iterable[str]) -> Dict[str, Optional[Dict]]:
+        account_ids = list(dict.fromkeys(account_ids))
+        accounts = await asyncio.gather(*(self.load(account_id) for account_id in account_ids))
+        return dict(zip(account_ids, accounts))
+
+    async def _dispatch(self):
+        account_ids, self._queue = self._queue, []
+        object_ids = [ObjectId(account_id) for account_id in account_ids if ObjectId.is_valid(account_id)]
+        try:
+            accounts = []
+            if object_ids:
+                self.db_calls += 1
+                accounts = await self.collection.find(
+                    {"_id": {"$in": object_ids}}, ACCOUNT_LOADER_PROJECTION
+                ).to_list(len(object_ids))
+        except Exception as e:
+            for account_id in account_ids:
+                self._results[account_id].set_exception(e)
+            return
+
+        by_id = {str(account["_id"]): account for account in accounts}
+        for account_id in account_ids:
+            self._results[account_id].set_result(by_id.get(account_id))
+
+class AccountLoaders:
+    """One AccountLoader per role, created on first use within a request."""
+
+    def __init__(self):
+        self._loaders: Dict[str, AccountLoader] = {}
+
+    def __getitem__(self, role: str) -> AccountLoader:
+        if role not in self._loaders:
+            self._loaders[role] = AccountLoader(role)
+        return self._loaders[role]
+
+    @property
+    def db_calls(self) -> int:
+        return sum(loader.db_calls for loader in self._loaders.values())
+
+async def get_account_loaders(request: Request) -> AccountLoaders:
+    """Request-scoped loaders, shared by every dependency and handler of the request."""
+    loaders = getattr(request.state, "account_loaders", None)
+    if loaders is None:
+        loaders = AccountLoaders()
+        request.state.account_loaders = loaders
+    return loaders
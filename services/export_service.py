@@ -0,0 +1,80 @@
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from database import videos_collection
+from utils.serialization import dumps
+from typing import AsyncIterator, Callable, List
+import csv
+import io
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Documents per cursor batch and per chunk written to the client
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Flat columns for spreadsheet and analytics tooling
+EXPORT_CSV_FIELDS = [
+    "_id", "youtube_id", "title", "category", "uploaded_by", "upload_date",
+    "view_count", "view_count_value", "stats_refreshed_at",
+]
+
+def _catalog_cursor(projection=None, raw: bool = False):
+    # Export in _id order so a dropped download can be compared against a retry
+    collection = videos_collection
+    if raw:
+        # Documents stay as the BSON bytes the server sent and are never decoded
+        collection = videos_collection.with_options(codec_options=CodecOptions(document_class=RawBSONDocument))
+    return collection.find({}, projection, batch_size=EXPORT_BATCH_SIZE).sort("_id", 1)
+
+async def _stream_batches(cursor, encode: Callable[[List], bytes]) -> AsyncIterator[bytes]:
+    """Encode and yield the cursor's documents EXPORT_BATCH_SIZE at a time."""
+    batch = []
+    try:
+        async for document in cursor:
+            batch.append(document)
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                yield encode(batch)
+                batch = []
+        if batch:
+            yield encode(batch)
+    finally:
+        # Free the server-side cursor when the client disconnects mid-export
+        await cursor.close()
+
+async def stream_videos_ndjson() -> AsyncIterator[bytes]:
+    """The whole catalog as NDJSON, one chunk per cursor batch."""
+    async for chunk in _stream_batches(_catalog_cursor(), lambda videos: b"".join(dumps(video) + b"\n" for video in videos)):
+        yield chunk
+
+async def stream_videos_bson() -> AsyncIterator[bytes]:
+    """The whole catalog as concatenated BSON documents, as mongodump writes them.
+
+    The server's bytes are passed through untouched, so this is the cheapest format to produce;
+    read it back with bsondump, mongorestore or bson.decode_file_iter.
+    """
+    async for chunk in _stream_batches(_catalog_cursor(raw=True), lambda videos: b"".join(video.raw for video in videos)):
+        yield chunk
+
+async def stream_videos_csv() -> AsyncIterator[bytes]:
+    """The catalog's EXPORT_CSV_FIELDS as CSV, header first, then one chunk per cursor batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_CSV_FIELDS)
+    # The header goes out before the first query so the client sees bytes immediately
+    yield _drain(buffer)
+
+    def encode(videos: List) -> bytes:
+        for video in videos:
+            values = [video.get(field) for field in EXPORT_CSV_FIELDS]
+            writer.writerow(["" if value is None else value for value in values])
+        return _drain(buffer)
+
+    async for chunk in _stream_batches(_catalog_cursor({field: 1 for field in EXPORT_CSV_FIELDS}), encode):
+        yield chunk
+
+def _drain(buffer: io.StringIO) -> bytes:
+    chunk = buffer.getvalue().encode()
+    buffer.seek(0)
+    buffer.truncate()
+    return chunk
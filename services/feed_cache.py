@@ -0,0 +1,78 @@
+from cachetools import LRUCache
+from utils.serialization import dumps
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+import os
+import sys
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Per-worker memory bound for cached feed pages, in bytes of encoded JSON
+FEED_CACHE_MAX_BYTES = int(os.getenv("FEED_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# The only fields per-user ranking reads; the rest of each video lives only in its encoded bytes
+RANK_KEYS = ("_id", "upload_date", "view_count", "category")
+
+def _footprint(item: Tuple[Dict, bytes]) -> int:
+    keys, encoded = item
+    return sys.getsizeof(item) + sys.getsizeof(keys) + sum(sys.getsizeof(value) for value in keys.values()) + sys.getsizeof(encoded)
+
+class FeedPage:
+    """One page of the base feed with every video already encoded as JSON."""
+
+    __slots__ = ("items", "next_cursor", "nbytes")
+
+    def __init__(self, videos: List[Tuple[Dict, Dict]], next_cursor: Optional[str]):
+        # (stored document, response video) pairs: the ranking keys come from the stored document,
+        # which always has them, since the response video may be cut down by `fields=`
+        self.items = [
+            ({key: stored[key] for key in RANK_KEYS if key in stored}, dumps(video)) for stored, video in videos
+        ]
+        self.next_cursor = next_cursor
+        self.nbytes = sum(_footprint(item) for item in self.items) + sys.getsizeof(self.items) or 1
+
+_feed_cache = LRUCache(maxsize=FEED_CACHE_MAX_BYTES, getsizeof=lambda page: page.nbytes)
+_feed_cache_stats = {"hits": 0, "misses": 0, "rebuilds": 0, "last_rebuild_ms": 0.0, "total_rebuild_ms": 0.0}
+
+async def get_feed_page(key: Hashable, build: Callable[[], Awaitable[Tuple[List[Tuple[Dict, Dict]], Optional[str]]]]) -> FeedPage:
+    """Cached base feed page for `key`, built with `build()` on a miss."""
+    page = _feed_cache.get(key)
+    if page is not None:
+        _feed_cache_stats["hits"] += 1
+        return page
+
+    _feed_cache_stats["misses"] += 1
+    started = time.perf_counter()
+    videos, next_cursor = await build()
+    page = FeedPage(videos, next_cursor)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    _feed_cache_stats["rebuilds"] += 1
+    _feed_cache_stats["last_rebuild_ms"] = round(elapsed_ms, 2)
+    _feed_cache_stats["total_rebuild_ms"] += elapsed_ms
+    # Pages larger than the whole cache are served but not kept
+    if page.nbytes <= FEED_CACHE_MAX_BYTES:
+        _feed_cache[key] = page
+    return page
+
+def render_feed(encoded_videos: List[bytes], next_cursor: Optional[str]) -> bytes:
+    """Assemble the response body from pre-encoded videos without re-serializing them."""
+    return b'{"videos":[' + b",".join(encoded_videos) + b'],"next_cursor":' + dumps(next_cursor) + b"}"
+
+def invalidate_feed_cache():
+    _feed_cache.clear()
+
+def feed_cache_stats() -> Dict:
+    """Snapshot of the feed cache for the metrics endpoint."""
+    lookups = _feed_cache_stats["hits"] + _feed_cache_stats["misses"]
+    rebuilds = _feed_cache_stats["rebuilds"]
+    return {
+        "pages": len(_feed_cache),
+        "bytes": _feed_cache.currsize,
+        "max_bytes": FEED_CACHE_MAX_BYTES,
+        "hits": _feed_cache_stats["hits"],
+        "misses": _feed_cache_stats["misses"],
+        "hit_ratio": round(_feed_cache_stats["hits"] / lookups, 4) if lookups else 0.0,
+        "last_rebuild_ms": _feed_cache_stats["last_rebuild_ms"],
+        "avg_rebuild_ms": round(_feed_cache_stats["total_rebuild_ms"] / rebuilds, 2) if rebuilds else 0.0,
+    }
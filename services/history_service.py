@@ -0,0 +1,223 @@
+from pymongo import UpdateOne
+from database import watch_history_collection
+from services.version_service import bump_versions, history_version_key
+from bson import ObjectId
+from datetime import datetime
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import os
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+WATCH_HISTORY_LIMIT = 50
+# Entries per bucket document; a full bucket starts a new one for the same day
+BUCKET_CAPACITY = 200
+# Recent-history reads stop after this many buckets, so their cost does not grow with the history
+RECENT_HISTORY_MAX_BUCKETS = int(os.getenv("WATCH_HISTORY_RECENT_BUCKETS", "10"))
+
+# Optional write-behind buffering of watch events (off by default)
+WRITE_BEHIND_ENABLED = os.getenv("WATCH_HISTORY_WRITE_BEHIND", "false").lower() == "true"
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WATCH_HISTORY_FLUSH_SIZE", "500"))
+WRITE_BEHIND_FLUSH_SECONDS = float(os.getenv("WATCH_HISTORY_FLUSH_SECONDS", "2"))
+
+def bucket_start(timestamp: datetime) -> datetime:
+    """Watch events are bucketed per user per UTC day."""
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def make_entry(video_id: str, watched_at: datetime, position: Optional[float] = None) -> Dict:
+    # Short keys keep the bucket documents compact
+    entry = {"v": video_id, "t": watched_at}
+    if position is not None:
+        entry["p"] = position
+    return entry
+
+def _bucket_update(account_id: ObjectId, bucket: datetime, entries: List[Dict]) -> UpdateOne:
+    # Only match a bucket that still has room for every entry being appended
+    return UpdateOne(
+        {"account_id": account_id, "bucket": bucket, "count": {"$lte": BUCKET_CAPACITY - len(entries)}},
+        {"$push": {"entries": {"$each": entries}}, "$inc": {"count": len(entries)}},
+        upsert=True,
+    )
+
+# account_id -> {video_id: entry}; only the latest event per video is kept
+_pending: Dict[str, Dict[str, Dict]] = {}
+_pending_count = 0
+# The batch currently being written, still visible to reads until the write lands
+_flushing: Dict[str, Dict[str, Dict]] = {}
+# Created in start_history_writer so they bind to the server's event loop
+_flush_lock: Optional[asyncio.Lock] = None
+_flush_wakeup: Optional[asyncio.Event] = None
+_flush_stop: Optional[asyncio.Event] = None
+_flush_task: Optional[asyncio.Task] = None
+_write_behind_stats = {"flushes": 0, "entries_flushed": 0, "last_batch_size": 0, "last_flush_ms": 0.0, "max_flush_ms": 0.0, "failures": 0}
+
+def _buffer_event(account_id: str, entry: Dict):
+    global _pending_count
+    events = _pending.setdefault(account_id, {})
+    if events.pop(entry["v"], None) is None:
+        _pending_count += 1
+    # Re-inserting keeps each account's dict in watch order
+    events[entry["v"]] = entry
+    if _pending_count >= WRITE_BEHIND_MAX_PENDING and _flush_wakeup is not None:
+        _flush_wakeup.set()
+
+def _requeue(batch: Dict[str, Dict[str, Dict]]):
+    """Put a batch that was not written back, ahead of anything newer that arrived meanwhile."""
+    global _pending_count
+    for account_id, events in batch.items():
+        newer = _pending.get(account_id, {})
+        merged = {video_id: entry for video_id, entry in events.items() if video_id not in newer}
+        _pending_count += len(merged)
+        merged.update(newer)
+        _pending[account_id] = merged
+
+async def flush_watch_events() -> bool:
+    """Write all buffered watch events with one bulk_write; False if the write failed."""
+    global _pending, _pending_count, _flushing
+    if not _pending or _flush_lock is None:
+        return True
+    async with _flush_lock:
+        if not _pending:
+            return True
+        batch, _pending, _pending_count = _pending, {}, 0
+        _flushing = batch
+
+        grouped: Dict[tuple, List[Dict]] = {}
+        for account_id, events in batch.items():
+            for entry in events.values():
+                grouped.setdefault((account_id, bucket_start(entry["t"])), []).append(entry)
+        operations = [
+            _bucket_update(ObjectId(account_id), bucket, entries)
+            for (account_id, bucket), entries in grouped.items()
+        ]
+
+        started = time.perf_counter()
+        try:
+            await watch_history_collection.bulk_write(operations, ordered=False)
+        except asyncio.CancelledError:
+            # Keep the events for the next flush rather than dropping them with the task
+            _flushing = {}
+            _requeue(batch)
+            raise
+        except Exception as e:
+            _flushing = {}
+            _write_behind_stats["failures"] += 1
+            logger.error(f"Failed to flush {len(operations)} watch history buckets: {str(e)}")
+            _requeue(batch)
+            return False
+
+        # Bump before dropping the in-flight batch so ETags never regress to a pre-write value
+        try:
+            await bump_versions(history_version_key(account_id) for account_id in batch)
+        except Exception as e:
+            logger.error(f"Failed to bump watch history versions: {str(e)}")
+        _flushing = {}
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        entries_flushed = sum(len(entries) for entries in grouped.values())
+        _write_behind_stats["flushes"] += 1
+        _write_behind_stats["entries_flushed"] += entries_flushed
+        _write_behind_stats["last_batch_size"] = entries_flushed
+        _write_behind_stats["last_flush_ms"] = round(elapsed_ms, 2)
+        _write_behind_stats["max_flush_ms"] = round(max(_write_behind_stats["max_flush_ms"], elapsed_ms), 2)
+        return True
+
+async def _flush_loop():
+    while not _flush_stop.is_set():
+        try:
+            await asyncio.wait_for(_flush_wakeup.wait(), timeout=WRITE_BEHIND_FLUSH_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _flush_wakeup.clear()
+        if not await flush_watch_events():
+            # Back off instead of hammering an unavailable database, unless shutting down
+            try:
+                await asyncio.wait_for(_flush_stop.wait(), timeout=WRITE_BEHIND_FLUSH_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+def start_history_writer():
+    """Start the background flusher when write-behind is enabled."""
+    global _flush_task, _flush_lock, _flush_wakeup, _flush_stop
+    if WRITE_BEHIND_ENABLED and _flush_task is None:
+        _flush_lock = asyncio.Lock()
+        _flush_wakeup = asyncio.Event()
+        _flush_stop = asyncio.Event()
+        _flush_task = asyncio.create_task(_flush_loop())
+
+async def stop_history_writer():
+    """Let the flusher finish its current write, then drain whatever is still buffered."""
+    global _flush_task
+    if _flush_task is not None:
+        # No cancel: a cancelled bulk_write would leave its batch neither written nor buffered
+        _flush_stop.set()
+        _flush_wakeup.set()
+        await _flush_task
+        _flush_task = None
+    await flush_watch_events()
+
+def write_behind_stats() -> Dict:
+    """Snapshot of the write-behind buffer for the metrics endpoint."""
+    return {"enabled": WRITE_BEHIND_ENABLED, "pending": _pending_count, **_write_behind_stats}
+
+async def record_watch_event(account_id: str, video_id: str, position: Optional[float] = None):
+    """Record a watch event, buffered when write-behind is on, otherwise in one upsert."""
+    watched_at = datetime.utcnow()
+    entry = make_entry(video_id, watched_at, position)
+    if WRITE_BEHIND_ENABLED:
+        _buffer_event(account_id, entry)
+        return
+    await watch_history_collection.bulk_write([_bucket_update(ObjectId(account_id), bucket_start(watched_at), [entry])])
+    # Only after the write lands, or a poll in between would cache the old history under the new ETag
+    await bump_versions([history_version_key(account_id)])
+
+def pending_marker(account_id: str) -> str:
+    """Identifies this worker's unflushed events for an account, for use in ETags."""
+    buffered = [*_flushing.get(account_id, {}).values(), *_pending.get(account_id, {}).values()]
+    if not buffered:
+        return ""
+    return f"{len(buffered)}:{max(entry['t'] for entry in buffered).isoformat()}"
+
+async def recent_watch_history(account_id: str, limit: int = WATCH_HISTORY_LIMIT) -> List[Dict]:
+    """Most recent `limit` distinct videos the account watched, newest first.
+
+    Only the newest RECENT_HISTORY_MAX_BUCKETS buckets are read, so an account that rewatches
+    a few videos can get fewer than `limit` entries back, and the oldest day read may be partial.
+    """
+    history = []
+    seen = set()
+    # Buffered events are newer than anything stored, and this worker must see its own writes
+    buffered = [*_flushing.get(account_id, {}).values(), *_pending.get(account_id, {}).values()]
+    for entry in reversed(buffered):
+        if entry["v"] in seen:
+            continue
+        seen.add(entry["v"])
+        history.append({"video_id": entry["v"], "watched_at": entry["t"], "position": entry.get("p")})
+        if len(history) >= limit:
+            return history
+    cursor = (
+        watch_history_collection.find({"account_id": ObjectId(account_id)}, {"entries": 1})
+        .sort([("bucket", -1), ("_id", -1)])
+        .limit(RECENT_HISTORY_MAX_BUCKETS)
+        .batch_size(4)
+    )
+    # Racing first writes of a day can each upsert a bucket, so one day may span several buckets
+    # in no useful _id order; merge them all by watch time instead of trusting the bucket order
+    entries = []
+    async for bucket in cursor:
+        entries.extend(reversed(bucket["entries"]))
+    entries.sort(key=lambda entry: entry["t"], reverse=True)
+    for entry in entries:
+        if entry["v"] in seen:
+            continue
+        seen.add(entry["v"])
+        history.append({"video_id": entry["v"], "watched_at": entry["t"], "position": entry.get("p")})
+        if len(history) >= limit:
+            break
+    return history
+
+async def recent_video_ids(account_id: str, limit: int = WATCH_HISTORY_LIMIT) -> List[str]:
+    return [entry["video_id"] for entry in await recent_watch_history(account_id, limit)]
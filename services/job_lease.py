@@ -0,0 +1,51 @@
+from pymongo.errors import DuplicateKeyError
+from database import background_jobs_collection
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import os
+import socket
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Identifies this worker process as a lease owner
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+async def acquire_lease(job: str, seconds: float) -> bool:
+    """Take or renew the job's lease; False while another worker holds a live one.
+
+    Background jobs that must run once per deployment, not once per uvicorn worker, hold this lease.
+    """
+    now = datetime.utcnow()
+    try:
+        await background_jobs_collection.update_one(
+            {"_id": job, "$or": [{"owner": WORKER_ID}, {"lease_until": {"$lt": now}}]},
+            {"$set": {"owner": WORKER_ID, "lease_until": now + timedelta(seconds=seconds)}},
+            upsert=True,
+        )
+        return True
+    except DuplicateKeyError:
+        # The filter missed because the lease is live elsewhere, and the upsert hit its _id
+        return False
+
+async def release_lease(job: str):
+    """Expire our lease now so another worker can take the job over without waiting it out."""
+    await background_jobs_collection.update_one(
+        {"_id": job, "owner": WORKER_ID}, {"$set": {"lease_until": datetime.utcnow()}}
+    )
+
+async def hold_lease_while(job: str, seconds: float, task: asyncio.Task):
+    """Renew the lease until `task` finishes; cancel the task if the lease is lost."""
+    while not task.done():
+        await asyncio.wait({task}, timeout=seconds / 3)
+        if task.done():
+            break
+        try:
+            renewed = await acquire_lease(job, seconds)
+        except Exception as e:
+            logger.warning(f"Failed to renew the {job} lease: {str(e)}")
+            renewed = False
+        if not renewed:
+            logger.warning(f"Lost the {job} lease, stopping")
+            task.cancel()
@@ -0,0 +1,52 @@
+from fastapi import Request, Response
+from pymongo import UpdateOne
+from database import versions_collection
+from services.feed_cache import invalidate_feed_cache
+from typing import Dict, Iterable, List, Tuple
+import hashlib
+
+# Version counter keys; bumped on every write that changes what the key covers
+CATALOG_VERSION = "videos"
+
+def history_version_key(account_id: str) -> str:
+    return f"history:{account_id}"
+
+async def bump_versions(keys: Iterable[str]):
+    """Increment the given counters in one round trip."""
+    keys = list(keys)
+    operations = [UpdateOne({"_id": key}, {"$inc": {"version": 1}}, upsert=True) for key in keys]
+    if operations:
+        await versions_collection.bulk_write(operations, ordered=False)
+    # Cached feed pages are keyed by catalog version; drop this worker's old ones now
+    if CATALOG_VERSION in keys:
+        invalidate_feed_cache()
+
+async def get_versions(keys: List[str]) -> Dict[str, int]:
+    """Current value of each counter; keys never bumped read as 0."""
+    versions = {key: 0 for key in keys}
+    async for counter in versions_collection.find({"_id": {"$in": keys}}):
+        versions[counter["_id"]] = counter["version"]
+    return versions
+
+def make_etag(*parts) -> str:
+    """Strong ETag over everything the response depends on."""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]
+
+async def request_etag(request: Request, user: dict, keys: List[str], *extra) -> Tuple[str, Dict[str, int]]:
+    """ETag for a per-user GET: the caller, the exact URL and the counters it reads.
+
+    The counter values are returned too, so callers can key caches on them.
+    """
+    versions = await get_versions(keys)
+    etag = make_etag(user["user_id"], user["role"], request.url.path, request.url.query, *(versions[key] for key in keys), *extra)
+    return etag, versions
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
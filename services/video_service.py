@@ -0,0 +1,411 @@
+from fastapi import HTTPException
+from pymongo.errors import BulkWriteError, OperationFailure
+from database import videos_collection, doctors_collection, background_jobs_collection
+from services.auth_service import AccountLoaders
+from services.version_service import bump_versions, CATALOG_VERSION
+from services.job_lease import acquire_lease, hold_lease_while, release_lease, WORKER_ID
+from services.youtube_service import fetch_youtube_metadata, resolve_video_id, extract_video_id, canonical_url, get_video_metadata_many
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import base64
+import json
+import logging
+import os
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Watch the doctors collection and push profile changes onto their videos
+DOCTOR_SUMMARY_PROPAGATION = os.getenv("DOCTOR_SUMMARY_PROPAGATION", "true").lower() == "true"
+# Server error code when a resume token has fallen off the oplog
+CHANGE_STREAM_HISTORY_LOST = 286
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Newest first; _id breaks ties so the order is total and stable across pages
+CATALOG_SORT = [("upload_date", -1), ("_id", -1)]
+
+# Fields stored on a video document that listings may return
+VIDEO_FIELDS = ["youtube_id", "youtube_url", "title", "description", "category", "uploaded_by", "upload_date", "view_count", "thumbnail", "doctor"]
+
+# Doctor profile fields copied onto each of their videos as the `doctor` summary
+DOCTOR_SUMMARY_FIELDS = {"name": 1, "profile_picture": 1, "verified": 1}
+
+def doctor_summary(doctor: Optional[Dict]) -> Dict:
+    """The uploader details a feed card renders, denormalized onto each video."""
+    doctor = doctor or {}
+    return {
+        "name": doctor.get("name", "Unknown"),
+        "avatar": doctor.get("profile_picture") or "",
+        "verified": bool(doctor.get("verified", False)),
+    }
+
+def _video_document(youtube_id: str, metadata: Dict, category: str, description: Optional[str], user: dict, doctor: Optional[Dict]) -> Dict:
+    return {
+        "youtube_id": youtube_id,
+        "youtube_url": canonical_url(youtube_id),
+        "title": metadata["title"],
+        "description": description if description else metadata["description"],
+        "category": category,
+        "uploaded_by": user["user_id"],
+        "upload_date": metadata["upload_date"],
+        "view_count": metadata["view_count"],
+        # Numeric copy and freshness of view_count for the background refresher
+        "view_count_value": parse_view_count(metadata["view_count"]),
+        "stats_refreshed_at": datetime.utcnow(),
+        "thumbnail": metadata["thumbnail"],
+        "doctor": doctor_summary(doctor),
+    }
+
+async def create_video(video, user: dict, loaders: AccountLoaders) -> Tuple[Dict, bool]:
+    """Store a video for its canonical YouTube ID, or return the one already stored.
+
+    Returns the video and whether it was newly created. Known videos skip the
+    YouTube API entirely.
+    """
+    youtube_id = resolve_video_id(video.youtube_url)
+    existing = await videos_collection.find_one({"youtube_id": youtube_id})
+    if existing:
+        return {**existing, "_id": str(existing["_id"])}, False
+
+    youtube_metadata, doctor = await asyncio.gather(
+        fetch_youtube_metadata(video.youtube_url),
+        loaders["doctor"].load(user["user_id"]),
+    )
+    video_data = _video_document(youtube_id, youtube_metadata, video.category, video.description, user, doctor)
+    # Upsert on the unique youtube_id so concurrent imports of one video store it once
+    result = await videos_collection.update_one(
+        {"youtube_id": youtube_id}, {"$setOnInsert": video_data}, upsert=True
+    )
+    if result.upserted_id is None:
+        existing = await videos_collection.find_one({"youtube_id": youtube_id})
+        return {**existing, "_id": str(existing["_id"])}, False
+
+    video_data["_id"] = str(result.upserted_id)  # Convert ObjectId to string
+    await bump_versions([CATALOG_VERSION])
+    return video_data, True
+
+async def import_videos(bulk, user: dict, loaders: AccountLoaders) -> List[Dict]:
+    """Import many YouTube URLs at once and report the outcome for each URL.
+
+    URLs are canonicalized and deduplicated, known videos are skipped, metadata for
+    the rest is fetched 50 IDs per upstream call, and new videos go in with one
+    unordered insert_many.
+    """
+    report = [{"url": url} for url in bulk.youtube_urls]
+    first_row: Dict[str, Dict] = {}
+    for row in report:
+        try:
+            youtube_id = extract_video_id(row["url"])
+        except ValueError:
+            row["status"] = "invalid_url"
+            continue
+        row["youtube_id"] = youtube_id
+        if youtube_id in first_row:
+            row["status"] = "duplicate_in_request"
+            continue
+        first_row[youtube_id] = row
+
+    existing = videos_collection.find({"youtube_id": {"$in": list(first_row)}}, {"youtube_id": 1})
+    async for video in existing:
+        row = first_row.pop(video["youtube_id"])
+        row.update(status="exists", video_id=str(video["_id"]))
+
+    if first_row:
+        (metadata, upstream_failed), doctor = await asyncio.gather(
+            get_video_metadata_many(list(first_row)),
+            loaders["doctor"].load(user["user_id"]),
+        )
+        upstream_failed = set(upstream_failed)
+        documents = []
+        for youtube_id, row in first_row.items():
+            if youtube_id in upstream_failed:
+                # Quota, timeout or 5xx: the video may well exist, so the client should retry it
+                row["status"] = "error"
+                continue
+            if youtube_id not in metadata:
+                row["status"] = "not_found"
+                continue
+            documents.append(_video_document(youtube_id, metadata[youtube_id], bulk.category, bulk.description, user, doctor))
+
+        failed = {}
+        if documents:
+            try:
+                await videos_collection.insert_many(documents, ordered=False)
+            except BulkWriteError as e:
+                # A concurrent import can win the unique youtube_id; everything else went in
+                failed = {error["index"]: error for error in e.details.get("writeErrors", [])}
+        for index, document in enumerate(documents):
+            row = first_row[document["youtube_id"]]
+            if index in failed:
+                row["status"] = "exists" if failed[index].get("code") == 11000 else "error"
+            else:
+                row.update(status="created", video_id=str(document["_id"]))
+        if len(failed) < len(documents):
+            await bump_versions([CATALOG_VERSION])
+
+    return report
+
+async def propagate_doctor_summary(doctor_id: str):
+    """Rewrite the denormalized summary on every video the doctor uploaded."""
+    doctor = None
+    if ObjectId.is_valid(doctor_id):
+        doctor = await doctors_collection.find_one({"_id": ObjectId(doctor_id)}, DOCTOR_SUMMARY_FIELDS)
+    result = await videos_collection.update_many({"uploaded_by": doctor_id}, {"$set": {"doctor": doctor_summary(doctor)}})
+    if result.modified_count:
+        await bump_versions([CATALOG_VERSION])
+
+# Backfills in flight, by doctor; holding the task also keeps it from being garbage-collected
+_backfill_tasks: Dict[str, asyncio.Task] = {}
+
+def _schedule_backfill(doctor_id: str, summary: Dict):
+    if doctor_id in _backfill_tasks:
+        return
+
+    async def backfill():
+        # Only videos still missing a summary; the default one too, so unknown uploaders stop being looked up
+        try:
+            await videos_collection.update_many(
+                {"uploaded_by": doctor_id, "doctor": {"$exists": False}}, {"$set": {"doctor": summary}}
+            )
+        except Exception as e:
+            logger.warning(f"Failed to backfill doctor summary for {doctor_id}: {str(e)}")
+
+    task = asyncio.ensure_future(backfill())
+    _backfill_tasks[doctor_id] = task
+    task.add_done_callback(lambda _: _backfill_tasks.pop(doctor_id, None))
+
+async def attach_doctor_summaries(videos: List[Dict], loaders: AccountLoaders):
+    """Fill in `doctor` on legacy videos with one batched lookup, then backfill them."""
+    missing = [video for video in videos if "doctor" not in video and video.get("uploaded_by")]
+    if not missing:
+        return
+    doctors = await loaders["doctor"].load_many(video["uploaded_by"] for video in missing)
+    summaries = {doctor_id: doctor_summary(doctor) for doctor_id, doctor in doctors.items()}
+    for video in missing:
+        video["doctor"] = summaries[video["uploaded_by"]]
+    for doctor_id, summary in summaries.items():
+        _schedule_backfill(doctor_id, summary)
+
+# One worker per deployment runs the propagator, under a lease in background_jobs
+PROPAGATOR_JOB = "doctor_summary_propagator"
+PROPAGATOR_LEASE_SECONDS = int(os.getenv("DOCTOR_SUMMARY_LEASE_SECONDS", "30"))
+# How often an idle stream's resume token is saved
+RESUME_TOKEN_SAVE_SECONDS = 10
+
+async def _save_resume_token(token: Dict):
+    await background_jobs_collection.update_one(
+        {"_id": PROPAGATOR_JOB, "owner": WORKER_ID}, {"$set": {"resume_token": token}}
+    )
+
+async def _watch_doctor_profiles() -> bool:
+    """Follow doctor profile changes from the stored resume token; False if change streams are unavailable."""
+    # Only changes to the summarized fields matter
+    pipeline = [{"$match": {
+        "operationType": {"$in": ["update", "replace"]},
+        "$or": [
+            {"operationType": "replace"},
+            *({f"updateDescription.updatedFields.{field}": {"$exists": True}} for field in DOCTOR_SUMMARY_FIELDS),
+        ],
+    }}]
+    state = await background_jobs_collection.find_one({"_id": PROPAGATOR_JOB}, {"resume_token": 1})
+    resume_token = (state or {}).get("resume_token")
+    try:
+        # Picks up the changes made while no worker was watching
+        async with doctors_collection.watch(pipeline, resume_after=resume_token) as stream:
+            saved_at = time.monotonic()
+            while stream.alive:
+                # Returns None after an empty server-side wait, so idle tokens still get saved
+                change = await stream.try_next()
+                if change is not None:
+                    doctor_id = str(change["documentKey"]["_id"])
+                    try:
+                        await propagate_doctor_summary(doctor_id)
+                    except Exception as e:
+                        logger.error(f"Failed to propagate doctor summary for {doctor_id}: {str(e)}")
+                if change is not None or time.monotonic() - saved_at >= RESUME_TOKEN_SAVE_SECONDS:
+                    await _save_resume_token(stream.resume_token)
+                    saved_at = time.monotonic()
+    except OperationFailure as e:
+        if resume_token is not None and e.code == CHANGE_STREAM_HISTORY_LOST:
+            # The oplog rolled past the token; start over from now
+            logger.warning(f"Doctor summary resume token expired, changes since it may be missed: {str(e)}")
+            await _save_resume_token(None)
+            return True
+        # Change streams need a replica set; summaries then refresh only via backfill
+        logger.warning(f"Doctor summary propagation disabled: {str(e)}")
+        return False
+    return True
+
+async def _run_doctor_summary_propagator():
+    while True:
+        try:
+            if await acquire_lease(PROPAGATOR_JOB, PROPAGATOR_LEASE_SECONDS):
+                watcher = asyncio.create_task(_watch_doctor_profiles())
+                try:
+                    await hold_lease_while(PROPAGATOR_JOB, PROPAGATOR_LEASE_SECONDS, watcher)
+                finally:
+                    if not watcher.done():
+                        watcher.cancel()
+                if watcher.done() and not watcher.cancelled():
+                    if watcher.exception() is not None:
+                        logger.error(f"Doctor summary watcher failed: {str(watcher.exception())}")
+                    elif watcher.result() is False:
+                        # Without change streams there is nothing to follow
+                        return
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Doctor summary propagator failed: {str(e)}")
+        # Standby workers check back regularly so a dead leader is replaced within one lease
+        await asyncio.sleep(PROPAGATOR_LEASE_SECONDS / 3)
+
+_propagator_task: Optional[asyncio.Task] = None
+
+def start_doctor_summary_propagator():
+    global _propagator_task
+    if DOCTOR_SUMMARY_PROPAGATION and _propagator_task is None:
+        _propagator_task = asyncio.create_task(_run_doctor_summary_propagator())
+
+async def stop_doctor_summary_propagator():
+    global _propagator_task
+    if _propagator_task is not None:
+        _propagator_task.cancel()
+        try:
+            await _propagator_task
+        except asyncio.CancelledError:
+            pass
+        _propagator_task = None
+        try:
+            await release_lease(PROPAGATOR_JOB)
+        except Exception as e:
+            logger.warning(f"Failed to release the doctor summary lease: {str(e)}")
+
+def parse_fields(fields: Optional[str], allowed: List[str]) -> List[str]:
+    """Parse a `fields=a,b,c` sparse fieldset; no parameter means every allowed field."""
+    if not fields:
+        return list(allowed)
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+def build_projection(fields: List[str]) -> Dict:
+    # upload_date is the keyset sort key, so it is always needed to build the cursor
+    return {field: 1 for field in [*fields, "upload_date"]}
+
+def catalog_query(user: dict, category: Optional[str] = None) -> Dict:
+    """Doctors see only their own videos, users see the whole catalog."""
+    query = {}
+    if user["role"] == "doctor":
+        query["uploaded_by"] = user["user_id"]
+    if category:
+        query["category"] = category
+    return query
+
+async def find_videos_by_ids(
+    video_ids: List[str], projection: Optional[Dict] = None, query: Optional[Dict] = None
+) -> Dict[str, Dict]:
+    """Fetch many videos in one $in query, keyed by string _id; unknown or deleted IDs are absent."""
+    object_ids = [ObjectId(video_id) for video_id in video_ids if ObjectId.is_valid(video_id)]
+    if not object_ids:
+        return {}
+    videos = await videos_collection.find({**(query or {}), "_id": {"$in": object_ids}}, projection).to_list(len(object_ids))
+    return {str(video["_id"]): {**video, "_id": str(video["_id"])} for video in videos}
+
+def encode_cursor(video: Dict) -> str:
+    raw = json.dumps([video.get("upload_date"), str(video["_id"])]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Dict:
+    """Turn an opaque cursor into the keyset filter for the next page."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        upload_date, video_id = json.loads(base64.urlsafe_b64decode(padded))
+        video_id = ObjectId(video_id)
+    except (ValueError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    return {"$or": [
+        {"upload_date": {"$lt": upload_date}},
+        {"upload_date": upload_date, "_id": {"$lt": video_id}},
+    ]}
+
+async def find_videos_page(
+    query: Dict, limit: int, cursor: Optional[str] = None, projection: Optional[Dict] = None
+) -> Tuple[List[Dict], Optional[str]]:
+    """Fetch one page of videos in catalog order and the cursor for the page after it."""
+    if cursor:
+        query = {"$and": [query, decode_cursor(cursor)]}
+
+    # One extra document tells us whether another page exists
+    videos = await videos_collection.find(query, projection).sort(CATALOG_SORT).limit(limit + 1).to_list(limit + 1)
+    next_cursor = None
+    if len(videos) > limit:
+        videos = videos[:limit]
+        next_cursor = encode_cursor(videos[-1])
+    return videos, next_cursor
+
+async def find_watched_videos(watch_history: List[str], query: Dict, projection: Optional[Dict] = None) -> List[Dict]:
+    """The watched videos matching `query`, most recently watched first, in one $in query."""
+    videos = await find_videos_by_ids(watch_history, projection, query)
+    return [videos[video_id] for video_id in watch_history if video_id in videos]
+
+def parse_view_count(view_count) -> int:
+    # view_count is stored as YouTube's string form, or "N/A" when it was hidden
+    try:
+        return int(view_count)
+    except (TypeError, ValueError):
+        return 0
+
+def _view_count(video: Dict) -> int:
+    return parse_view_count(video.get("view_count", 0))
+
+def _order_newest(videos: List[Dict], watched: List[Dict]) -> List[Dict]:
+    return sorted(videos, key=lambda video: video.get("upload_date") or "", reverse=True)
+
+def _order_most_viewed(videos: List[Dict], watched: List[Dict]) -> List[Dict]:
+    return sorted(videos, key=_view_count, reverse=True)
+
+def _order_category_affinity(videos: List[Dict], watched: List[Dict]) -> List[Dict]:
+    affinity: Dict[str, int] = {}
+    for video in watched:
+        category = video.get("category")
+        affinity[category] = affinity.get(category, 0) + 1
+    return sorted(videos, key=lambda video: affinity.get(video.get("category"), 0), reverse=True)
+
+# Fields the orderings read besides the upload_date sort key
+RANKING_FIELDS = ["category", "view_count"]
+
+# Pluggable orderings for the videos the user has not watched yet
+UNWATCHED_ORDERINGS = {
+    "newest": _order_newest,
+    "most_viewed": _order_most_viewed,
+    "category_affinity": _order_category_affinity,
+}
+
+def rank_feed(
+    videos: List[Dict], watched_videos: List[Dict], unwatched_order: str = "newest", first_page: bool = True
+) -> List[Dict]:
+    """Watched videos first, most recently watched on top, then the page's other videos in the chosen order.
+
+    `watched_videos` come from find_watched_videos rather than the page, so a watched video leads
+    the first page wherever it sits in the catalog. They are dropped from every page so each shows
+    up once; the unwatched ordering applies within a page. Expects string `_id`s and runs in
+    O(videos + history) plus the sort.
+    """
+    ordering = UNWATCHED_ORDERINGS.get(unwatched_order)
+    if ordering is None:
+        raise HTTPException(status_code=400, detail=f"Unknown order: {unwatched_order}")
+
+    watched_ids = {video["_id"] for video in watched_videos}
+    unwatched = [video for video in videos if video["_id"] not in watched_ids]
+    ranked = ordering(unwatched, watched_videos)
+    return watched_videos + ranked if first_page else ranked
@@ -0,0 +1,161 @@
+from pymongo import UpdateOne
+from database import videos_collection
+from services.youtube_service import fetch_video_items, YOUTUBE_BATCH_SIZE
+from services.video_service import parse_view_count
+from services.version_service import bump_versions, CATALOG_VERSION
+from services.job_lease import acquire_lease, hold_lease_while, release_lease
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import os
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Off by default since it spends API quota; when on, one worker at a time runs it under a lease
+VIEW_REFRESH_ENABLED = os.getenv("VIEW_REFRESH_ENABLED", "false").lower() == "true"
+VIEW_REFRESH_JOB = "view_count_refresher"
+VIEW_REFRESH_LEASE_SECONDS = int(os.getenv("VIEW_REFRESH_LEASE_SECONDS", "60"))
+VIEW_REFRESH_INTERVAL_SECONDS = int(os.getenv("VIEW_REFRESH_INTERVAL_SECONDS", "900"))
+# Upper bound on videos.list calls per run; each call refreshes up to 50 videos
+VIEW_REFRESH_QUOTA_PER_RUN = int(os.getenv("VIEW_REFRESH_QUOTA_PER_RUN", "20"))
+VIEW_REFRESH_MAX_AGE_HOURS = float(os.getenv("VIEW_REFRESH_MAX_AGE_HOURS", "24"))
+# Popular videos are refreshed more often
+VIEW_REFRESH_POPULAR_VIEWS = int(os.getenv("VIEW_REFRESH_POPULAR_VIEWS", "10000"))
+VIEW_REFRESH_POPULAR_MAX_AGE_HOURS = float(os.getenv("VIEW_REFRESH_POPULAR_MAX_AGE_HOURS", "3"))
+# Share of each run reserved for popular videos, so a backlog of old ones cannot starve them
+VIEW_REFRESH_POPULAR_SHARE = float(os.getenv("VIEW_REFRESH_POPULAR_SHARE", "0.5"))
+
+_refresh_task: Optional[asyncio.Task] = None
+_refresh_stats = {
+    "runs": 0, "upstream_calls": 0, "videos_refreshed": 0, "failures": 0,
+    "last_run_at": None, "last_run_ms": 0.0, "last_max_lag_seconds": 0.0, "last_avg_lag_seconds": 0.0,
+}
+
+async def _stalest(query: Dict, limit: int) -> List[Dict]:
+    if limit <= 0:
+        return []
+    cursor = videos_collection.find(query, {"youtube_id": 1, "stats_refreshed_at": 1})
+    return await cursor.sort("stats_refreshed_at", 1).limit(limit).to_list(limit)
+
+async def find_stale_videos(limit: int) -> List[Dict]:
+    """Videos due a refresh, stalest first within each group.
+
+    Popular videos fall due sooner and get first claim on VIEW_REFRESH_POPULAR_SHARE of
+    the budget; whatever they leave goes to every other due video.
+    """
+    now = datetime.utcnow()
+    stale_before = now - timedelta(hours=VIEW_REFRESH_MAX_AGE_HOURS)
+    popular_stale_before = now - timedelta(hours=VIEW_REFRESH_POPULAR_MAX_AGE_HOURS)
+    popular = await _stalest({
+        "youtube_id": {"$exists": True},
+        "stats_refreshed_at": {"$lt": popular_stale_before},
+        "view_count_value": {"$gte": VIEW_REFRESH_POPULAR_VIEWS},
+    }, int(limit * VIEW_REFRESH_POPULAR_SHARE))
+    rest = await _stalest({
+        "youtube_id": {"$exists": True},
+        "_id": {"$nin": [video["_id"] for video in popular]},
+        "$or": [
+            {"stats_refreshed_at": {"$exists": False}},
+            {"stats_refreshed_at": {"$lt": stale_before}},
+            {"stats_refreshed_at": {"$lt": popular_stale_before}, "view_count_value": {"$gte": VIEW_REFRESH_POPULAR_VIEWS}},
+        ],
+    }, limit - len(popular))
+    return popular + rest
+
+async def refresh_view_counts() -> int:
+    """One refresh run within the quota budget; returns how many videos were updated."""
+    started = time.perf_counter()
+    videos = await find_stale_videos(VIEW_REFRESH_QUOTA_PER_RUN * YOUTUBE_BATCH_SIZE)
+    lags = []
+    refreshed = 0
+
+    for i in range(0, len(videos), YOUTUBE_BATCH_SIZE):
+        batch = videos[i:i + YOUTUBE_BATCH_SIZE]
+        try:
+            items = await fetch_video_items([video["youtube_id"] for video in batch], part="statistics")
+        except Exception as e:
+            _refresh_stats["failures"] += 1
+            logger.error(f"View count refresh call failed: {str(e)}")
+            break
+        _refresh_stats["upstream_calls"] += 1
+
+        view_counts = {item["id"]: item.get("statistics", {}).get("viewCount", "N/A") for item in items}
+        now = datetime.utcnow()
+        operations = []
+        for video in batch:
+            previous = video.get("stats_refreshed_at")
+            if previous:
+                lags.append((now - previous).total_seconds())
+            update = {"stats_refreshed_at": now}
+            # Videos YouTube no longer returns keep their last count but still rotate out
+            if video["youtube_id"] in view_counts:
+                view_count = view_counts[video["youtube_id"]]
+                update.update(view_count=view_count, view_count_value=parse_view_count(view_count))
+            operations.append(UpdateOne({"_id": video["_id"]}, {"$set": update}))
+        await videos_collection.bulk_write(operations, ordered=False)
+        refreshed += len(view_counts)
+
+    if refreshed:
+        await bump_versions([CATALOG_VERSION])
+
+    _refresh_stats["runs"] += 1
+    _refresh_stats["videos_refreshed"] += refreshed
+    _refresh_stats["last_run_at"] = datetime.utcnow().isoformat()
+    _refresh_stats["last_run_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    _refresh_stats["last_max_lag_seconds"] = round(max(lags), 1) if lags else 0.0
+    _refresh_stats["last_avg_lag_seconds"] = round(sum(lags) / len(lags), 1) if lags else 0.0
+    return refreshed
+
+async def _refresh_runs():
+    while True:
+        try:
+            await refresh_view_counts()
+        except Exception as e:
+            _refresh_stats["failures"] += 1
+            logger.error(f"View count refresh failed: {str(e)}")
+        await asyncio.sleep(VIEW_REFRESH_INTERVAL_SECONDS)
+
+async def _refresh_loop():
+    while True:
+        try:
+            if await acquire_lease(VIEW_REFRESH_JOB, VIEW_REFRESH_LEASE_SECONDS):
+                runner = asyncio.create_task(_refresh_runs())
+                try:
+                    await hold_lease_while(VIEW_REFRESH_JOB, VIEW_REFRESH_LEASE_SECONDS, runner)
+                finally:
+                    if not runner.done():
+                        runner.cancel()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"View count refresher failed: {str(e)}")
+        # Standby workers check back regularly so a dead leader is replaced within one lease;
+        # a new leader only picks up videos that are already due, so takeovers cost no extra quota
+        await asyncio.sleep(VIEW_REFRESH_LEASE_SECONDS / 3)
+
+def start_view_count_refresher():
+    global _refresh_task
+    if VIEW_REFRESH_ENABLED and _refresh_task is None:
+        _refresh_task = asyncio.create_task(_refresh_loop())
+
+async def stop_view_count_refresher():
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        try:
+            await _refresh_task
+        except asyncio.CancelledError:
+            pass
+        _refresh_task = None
+        try:
+            await release_lease(VIEW_REFRESH_JOB)
+        except Exception as e:
+            logger.warning(f"Failed to release the view count refresher lease: {str(e)}")
+
+def view_count_refresh_stats() -> Dict:
+    """Snapshot of the refresher for the metrics endpoint."""
+    return {"enabled": VIEW_REFRESH_ENABLED, **_refresh_stats}
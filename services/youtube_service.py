@@ -0,0 +1,265 @@
+from fastapi import HTTPException
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from cachetools import LRUCache
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import ReplaceOne
+from database import youtube_metadata_collection
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+import asyncio
+import logging
+import math
+import requests
+import time
+import re
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
+# Overridable so tests and local development can point at a stub server
+YOUTUBE_API_BASE_URL = os.getenv("YOUTUBE_API_BASE_URL", "https://www.googleapis.com/youtube/v3").rstrip("/")
+YOUTUBE_TIMEOUT_SECONDS = float(os.getenv("YOUTUBE_TIMEOUT_SECONDS", "5"))
+YOUTUBE_MAX_RETRIES = int(os.getenv("YOUTUBE_MAX_RETRIES", "3"))
+YOUTUBE_POOL_SIZE = int(os.getenv("YOUTUBE_POOL_SIZE", "20"))
+# Threads for blocking upstream calls; one call can hold a thread through every retry
+YOUTUBE_WORKERS = int(os.getenv("YOUTUBE_WORKERS", "8"))
+# Metadata younger than FRESH is served as-is; up to STALE it is served while refreshing
+METADATA_FRESH_SECONDS = int(os.getenv("METADATA_FRESH_SECONDS", str(6 * 3600)))
+METADATA_STALE_SECONDS = int(os.getenv("METADATA_STALE_SECONDS", str(7 * 24 * 3600)))
+METADATA_CACHE_SIZE = int(os.getenv("METADATA_CACHE_SIZE", "5000"))
+# videos.list accepts at most 50 IDs per call
+YOUTUBE_BATCH_SIZE = 50
+YOUTUBE_BATCH_CONCURRENCY = int(os.getenv("YOUTUBE_BATCH_CONCURRENCY", "4"))
+
+logger = logging.getLogger(__name__)
+
+def _build_session() -> requests.Session:
+    """Keep-alive session with a bounded connection pool and retry with backoff."""
+    retry = Retry(
+        total=YOUTUBE_MAX_RETRIES,
+        backoff_factor=0.3,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=YOUTUBE_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+# One session per process, shared by every router
+_session = _build_session()
+# Dedicated pool so a slow Google never ties up anyio's threadpool, which sync endpoints share
+_youtube_executor = ThreadPoolExecutor(max_workers=YOUTUBE_WORKERS, thread_name_prefix="youtube")
+
+YOUTUBE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{11}$")
+YOUTUBE_HOSTS = {
+    "youtube.com", "www.youtube.com", "m.youtube.com", "music.youtube.com",
+    "youtube-nocookie.com", "www.youtube-nocookie.com",
+}
+SHORT_HOSTS = {"youtu.be", "www.youtu.be"}
+# Path prefixes that are followed by the video ID, e.g. /shorts/<id> or /embed/<id>
+ID_PATH_PREFIXES = {"shorts", "embed", "live", "v", "e"}
+
+# Extract video ID from YouTube URL
+def extract_video_id(youtube_url: str) -> str:
+    url = youtube_url.strip()
+    if "://" not in url:
+        url = f"https://{url}"
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    path_parts = [part for part in parsed.path.split("/") if part]
+
+    candidate = None
+    if host in SHORT_HOSTS and path_parts:
+        candidate = path_parts[0]
+    elif host in YOUTUBE_HOSTS and path_parts == ["watch"]:
+        candidate = parse_qs(parsed.query).get("v", [None])[0]
+    elif host in YOUTUBE_HOSTS and len(path_parts) >= 2 and path_parts[0] in ID_PATH_PREFIXES:
+        candidate = path_parts[1]
+
+    if candidate and YOUTUBE_ID_PATTERN.match(candidate):
+        return candidate
+    raise ValueError("Invalid YouTube URL format")
+
+def canonical_url(video_id: str) -> str:
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+def resolve_video_id(youtube_url: str) -> str:
+    """Canonical video ID for any supported YouTube URL form, or a 400."""
+    try:
+        return extract_video_id(youtube_url)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _get(path: str, params: Dict) -> Dict:
+    response = _session.get(
+        f"{YOUTUBE_API_BASE_URL}/{path}",
+        params={**params, "key": YOUTUBE_API_KEY},
+        timeout=YOUTUBE_TIMEOUT_SECONDS,
+    )
+    response.raise_for_status()
+    return response.json()
+
+async def fetch_video_items(video_ids: List[str], part: str = "snippet,statistics") -> List[Dict]:
+    """Call videos.list for the given IDs without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    data = await loop.run_in_executor(_youtube_executor, _get, "videos", {"part": part, "id": ",".join(video_ids)})
+    return data.get("items", [])
+
+def metadata_from_item(video_info: Dict) -> Dict:
+    """Flatten a videos.list item into the fields stored on a video document."""
+    return {
+        "title": video_info["snippet"]["title"],
+        "description": video_info["snippet"]["description"],
+        "upload_date": video_info["snippet"]["publishedAt"],
+        "view_count": video_info["statistics"].get("viewCount", "N/A"),
+        "thumbnail": video_info["snippet"]["thumbnails"]["high"]["url"],
+    }
+
+# Two-tier metadata cache: in-process LRU in front of the youtube_metadata collection
+_metadata_cache = LRUCache(maxsize=METADATA_CACHE_SIZE)
+_metadata_inflight: Dict[str, asyncio.Task] = {}
+_metadata_stats = {"memory_hits": 0, "db_hits": 0, "stale_served": 0, "upstream_calls": 0}
+
+async def _refresh_metadata(video_id: str) -> Dict:
+    _metadata_stats["upstream_calls"] += 1
+    items = await fetch_video_items([video_id])
+    if not items:
+        raise HTTPException(status_code=404, detail="YouTube video not found")
+
+    entry = {"metadata": metadata_from_item(items[0]), "fetched_at": time.time()}
+    await youtube_metadata_collection.replace_one({"_id": video_id}, entry, upsert=True)
+    _metadata_cache[video_id] = entry
+    return entry
+
+def _on_refresh_done(video_id: str, task: asyncio.Task):
+    _metadata_inflight.pop(video_id, None)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Metadata refresh failed for {video_id}: {task.exception()}")
+
+def _single_flight_refresh(video_id: str) -> asyncio.Task:
+    """Return the in-flight refresh for this video, starting one if none is running."""
+    task = _metadata_inflight.get(video_id)
+    if task is None:
+        task = asyncio.ensure_future(_refresh_metadata(video_id))
+        task.add_done_callback(lambda t: _on_refresh_done(video_id, t))
+        _metadata_inflight[video_id] = task
+    return task
+
+async def get_video_metadata(video_id: str) -> Dict:
+    """Cached metadata for a YouTube video ID with stale-while-revalidate."""
+    entry = _metadata_cache.get(video_id)
+    if entry is not None:
+        _metadata_stats["memory_hits"] += 1
+    else:
+        entry = await youtube_metadata_collection.find_one({"_id": video_id}, {"_id": 0})
+        if entry is not None:
+            _metadata_stats["db_hits"] += 1
+            _metadata_cache[video_id] = entry
+
+    if entry is not None:
+        age = time.time() - entry["fetched_at"]
+        if age < METADATA_FRESH_SECONDS:
+            return entry["metadata"]
+        if age < METADATA_STALE_SECONDS:
+            _metadata_stats["stale_served"] += 1
+            _single_flight_refresh(video_id)
+            return entry["metadata"]
+
+    # Shield so a disconnecting client does not cancel a refresh other requests await
+    entry = await asyncio.shield(_single_flight_refresh(video_id))
+    return entry["metadata"]
+
+async def fetch_video_items_batched(
+    video_ids: List[str], part: str = "snippet,statistics"
+) -> Tuple[Dict[str, Dict], List[str]]:
+    """videos.list items keyed by ID, 50 IDs per upstream call with bounded concurrency.
+
+    Also returns the IDs of chunks whose call failed, so callers can tell them from unknown IDs.
+    """
+    semaphore = asyncio.Semaphore(YOUTUBE_BATCH_CONCURRENCY)
+
+    async def fetch_chunk(chunk: List[str]) -> List[Dict]:
+        async with semaphore:
+            return await fetch_video_items(chunk, part)
+
+    chunks = [video_ids[i:i + YOUTUBE_BATCH_SIZE] for i in range(0, len(video_ids), YOUTUBE_BATCH_SIZE)]
+    results = await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks), return_exceptions=True)
+
+    items = {}
+    failed: List[str] = []
+    for chunk, result in zip(chunks, results):
+        if isinstance(result, Exception):
+            logger.error(f"videos.list failed for {len(chunk)} IDs: {str(result)}")
+            failed.extend(chunk)
+            continue
+        for item in result:
+            items[item["id"]] = item
+    return items, failed
+
+async def get_video_metadata_many(video_ids: List[str]) -> Tuple[Dict[str, Dict], List[str]]:
+    """Cached metadata for many IDs; only uncached ones go upstream, in 50-ID batches.
+
+    Returns the metadata found and the IDs whose upstream call failed; other missing IDs do not exist.
+    """
+    found: Dict[str, Dict] = {}
+    failed: List[str] = []
+    missing = []
+    for video_id in video_ids:
+        entry = _metadata_cache.get(video_id)
+        if entry is not None and time.time() - entry["fetched_at"] < METADATA_STALE_SECONDS:
+            _metadata_stats["memory_hits"] += 1
+            found[video_id] = entry["metadata"]
+        else:
+            missing.append(video_id)
+
+    if missing:
+        cutoff = time.time() - METADATA_STALE_SECONDS
+        async for entry in youtube_metadata_collection.find({"_id": {"$in": missing}, "fetched_at": {"$gt": cutoff}}):
+            _metadata_stats["db_hits"] += 1
+            video_id = entry.pop("_id")
+            _metadata_cache[video_id] = entry
+            found[video_id] = entry["metadata"]
+        missing = [video_id for video_id in missing if video_id not in found]
+
+    if missing:
+        _metadata_stats["upstream_calls"] += math.ceil(len(missing) / YOUTUBE_BATCH_SIZE)
+        items, failed = await fetch_video_items_batched(missing)
+        fetched_at = time.time()
+        operations = []
+        for video_id, item in items.items():
+            entry = {"metadata": metadata_from_item(item), "fetched_at": fetched_at}
+            _metadata_cache[video_id] = entry
+            found[video_id] = entry["metadata"]
+            operations.append(ReplaceOne({"_id": video_id}, entry, upsert=True))
+        if operations:
+            await youtube_metadata_collection.bulk_write(operations, ordered=False)
+
+    return found, failed
+
+def metadata_cache_stats() -> Dict:
+    """Snapshot of the metadata cache for the metrics endpoint."""
+    return {
+        "size": len(_metadata_cache),
+        "max_size": METADATA_CACHE_SIZE,
+        "in_flight": len(_metadata_inflight),
+        **_metadata_stats,
+    }
+
+# Fetch video metadata from YouTube API
+async def fetch_youtube_metadata(youtube_url: str) -> Dict:
+    video_id = resolve_video_id(youtube_url)
+
+    try:
+        metadata = await get_video_metadata(video_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching metadata: {str(e)}")
+
+    return {**metadata, "youtube_id": video_id, "youtube_url": canonical_url(video_id)}
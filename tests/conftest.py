@@ -0,0 +1,108 @@
+"""Shared fixtures for the test suite.
+
+Tests that touch MongoDB run against TEST_MONGO_URI (default: a local mongod) in their own
+database and are skipped when no server answers:
+
+    TEST_MONGO_URI=mongodb://localhost:27017 python -m pytest -q
+"""
+import asyncio
+import os
+import pytest
+
+# Set before any app module is imported, so database.py never sees the .env connection
+os.environ["MONGO_URI"] = os.getenv("TEST_MONGO_URI", "mongodb://localhost:27017")
+os.environ["MONGO_DB_NAME"] = os.getenv("TEST_MONGO_DB_NAME", "video_streaming_test")
+os.environ.setdefault("MONGO_MIN_POOL_SIZE", "1")
+os.environ.setdefault("MONGO_SERVER_SELECTION_TIMEOUT_MS", "2000")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+@pytest.fixture(scope="session")
+def session_loop():
+    # One loop for the whole session: the Motor client binds to the loop it first runs on
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+@pytest.fixture(scope="session")
+def run(session_loop):
+    """Run a coroutine to completion on the session loop."""
+    return session_loop.run_until_complete
+
+@pytest.fixture(scope="session")
+def mongo_available(run):
+    from database import ping_database
+    return run(ping_database())
+
+@pytest.fixture
+def mongo(run, mongo_available):
+    """A clean test database with every registry index in place."""
+    if not mongo_available:
+        pytest.skip("MongoDB is not reachable at TEST_MONGO_URI")
+    from database import client, database, ensure_indexes
+    run(client.drop_database(database.name))
+    run(ensure_indexes())
+    yield database
+    run(client.drop_database(database.name))
+
+class YouTubeStub:
+    """Local fake of the videos.list endpoint, recording the IDs of every call."""
+
+    def __init__(self):
+        self.calls = []
+        # Any call that includes one of these IDs fails with a quota error
+        self.fail_ids = set()
+        # IDs answered with no item, as YouTube does for deleted or private videos
+        self.unknown_ids = set()
+        self.view_count = "1234"
+
+    def item(self, video_id):
+        return {
+            "id": video_id,
+            "snippet": {
+                "title": f"Video {video_id}",
+                "description": "",
+                "publishedAt": "2024-01-01T00:00:00Z",
+                "thumbnails": {"high": {"url": f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg"}},
+            },
+            "statistics": {"viewCount": self.view_count},
+        }
+
+@pytest.fixture
+def youtube_stub(monkeypatch):
+    """Serve videos.list from a local thread and point the YouTube client at it."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlparse
+    from services import youtube_service
+    import json
+    import threading
+
+    stub = YouTubeStub()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            ids = parse_qs(url.query).get("id", [""])[0].split(",")
+            stub.calls.append(ids)
+            if url.path != "/videos" or stub.fail_ids.intersection(ids):
+                self.send_response(403)
+                body = {"error": {"code": 403, "message": "quotaExceeded"}}
+            else:
+                self.send_response(200)
+                body = {"items": [stub.item(video_id) for video_id in ids if video_id not in stub.unknown_ids]}
+            payload = json.dumps(body).encode()
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(youtube_service, "YOUTUBE_API_BASE_URL", f"http://127.0.0.1:{server.server_port}")
+    yield stub
+    server.shutdown()
+    server.server_close()
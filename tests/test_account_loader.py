@@ -0,0 +1,26 @@
+from database import doctors_collection, start_db_call_count
+from services.auth_service import AccountLoaders
+import asyncio
+
+def test_concurrent_loads_share_one_query(run, mongo):
+    doctor_ids = [str(doctor_id) for doctor_id in run(doctors_collection.insert_many(
+        [{"email": f"doctor-{i}@example.com", "name": f"Doctor {i}", "password": "hash"} for i in range(3)]
+    )).inserted_ids]
+
+    async def load():
+        counter = start_db_call_count()
+        loaders = AccountLoaders()
+        first, many = await asyncio.gather(
+            loaders["doctor"].load(doctor_ids[0]),
+            loaders["doctor"].load_many([*doctor_ids, doctor_ids[0]]),
+        )
+        # Already loaded in this request: no further query
+        again = await loaders["doctor"].load(doctor_ids[1])
+        return first, many, again, loaders.db_calls, counter["calls"]
+
+    first, many, again, loader_calls, db_calls = run(load())
+    assert first["name"] == "Doctor 0" and "password" not in first
+    assert [many[doctor_id]["name"] for doctor_id in doctor_ids] == ["Doctor 0", "Doctor 1", "Doctor 2"]
+    assert again["name"] == "Doctor 1"
+    assert loader_calls == 1
+    assert db_calls == 1
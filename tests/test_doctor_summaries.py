@@ -0,0 +1,35 @@
+from bson import ObjectId
+from database import background_jobs_collection, videos_collection
+from datetime import datetime, timedelta
+from services.auth_service import AccountLoaders
+from services.job_lease import acquire_lease, release_lease
+from services import video_service
+import asyncio
+
+def test_legacy_videos_of_unknown_uploaders_get_a_default_summary(run, mongo):
+    run(videos_collection.insert_one({"title": "Legacy", "uploaded_by": str(ObjectId())}))
+
+    async def render_then_backfill():
+        videos = await videos_collection.find({}).to_list(None)
+        await video_service.attach_doctor_summaries(videos, AccountLoaders())
+        await asyncio.gather(*video_service._backfill_tasks.values())
+        return videos
+
+    rendered = run(render_then_backfill())
+    stored = run(videos_collection.find_one({}))
+    assert rendered[0]["doctor"]["name"] == "Unknown"
+    assert stored["doctor"] == rendered[0]["doctor"]
+
+def test_only_one_worker_holds_a_job_lease(run, mongo):
+    later = datetime.utcnow() + timedelta(minutes=5)
+    run(background_jobs_collection.insert_one({"_id": "job", "owner": "other-worker", "lease_until": later}))
+    assert run(acquire_lease("job", 30)) is False
+
+    run(background_jobs_collection.update_one({"_id": "job"}, {"$set": {"lease_until": datetime.utcnow() - timedelta(seconds=1)}}))
+    assert run(acquire_lease("job", 30)) is True
+    # Renewing our own lease keeps working
+    assert run(acquire_lease("job", 30)) is True
+
+    run(release_lease("job"))
+    lease = run(background_jobs_collection.find_one({"_id": "job"}))
+    assert lease["lease_until"] <= datetime.utcnow()
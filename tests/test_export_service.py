@@ -0,0 +1,35 @@
+from bson import ObjectId, decode_all
+from database import videos_collection
+from services import export_service
+import csv
+import io
+import json
+
+def collect(run, stream):
+    async def read():
+        return [chunk async for chunk in stream]
+    return run(read())
+
+def insert_videos(run, count):
+    run(videos_collection.insert_many([
+        {"youtube_id": f"vid{i:08d}", "title": f"Video, {i}", "view_count_value": i} for i in range(count)
+    ]))
+
+def test_exports_stream_in_batches(run, mongo, monkeypatch):
+    monkeypatch.setattr(export_service, "EXPORT_BATCH_SIZE", 2)
+    insert_videos(run, 5)
+
+    ndjson = collect(run, export_service.stream_videos_ndjson())
+    assert len(ndjson) == 3
+    lines = b"".join(ndjson).splitlines()
+    assert [json.loads(line)["youtube_id"] for line in lines] == [f"vid{i:08d}" for i in range(5)]
+
+    rows = list(csv.DictReader(io.StringIO(b"".join(collect(run, export_service.stream_videos_csv())).decode())))
+    assert [row["title"] for row in rows] == [f"Video, {i}" for i in range(5)]
+    assert rows[0]["stats_refreshed_at"] == ""
+
+def test_bson_export_passes_documents_through(run, mongo):
+    insert_videos(run, 3)
+    documents = decode_all(b"".join(collect(run, export_service.stream_videos_bson())))
+    assert [document["youtube_id"] for document in documents] == [f"vid{i:08d}" for i in range(3)]
+    assert isinstance(documents[0]["_id"], ObjectId)
@@ -0,0 +1,31 @@
+from services.feed_cache import FeedPage, render_feed
+from services.video_service import rank_feed
+import json
+
+VIDEO = {"_id": "a" * 24, "title": "t" * 100, "description": "d" * 2000, "upload_date": "2024-01-01", "view_count": "12"}
+
+def test_pages_keep_only_ranking_keys_beside_the_encoded_video():
+    page = FeedPage([(VIDEO, VIDEO)], None)
+    keys, encoded = page.items[0]
+    assert keys == {"_id": VIDEO["_id"], "upload_date": "2024-01-01", "view_count": "12"}
+    assert json.loads(encoded) == VIDEO
+    # The description is only held once, inside the encoded bytes, and is counted there
+    assert page.nbytes > len(encoded)
+
+def test_render_feed_stitches_encoded_videos():
+    page = FeedPage([(VIDEO, VIDEO), ({**VIDEO, "_id": "b" * 24}, {**VIDEO, "_id": "b" * 24})], "next")
+    body = render_feed([encoded for _, encoded in reversed(page.items)], page.next_cursor)
+    assert json.loads(body) == {"videos": [{**VIDEO, "_id": "b" * 24}, VIDEO], "next_cursor": "next"}
+
+def test_sparse_fieldsets_still_rank_by_the_stored_fields():
+    # fields=title&order=most_viewed: the response videos carry only their title
+    stored = [{"_id": f"{i}" * 24, "title": f"video {i}", "upload_date": "2024-01-01", "view_count": str(i * 10)} for i in range(3)]
+    page = FeedPage([(video, {"_id": video["_id"], "title": video["title"]}) for video in stored], None)
+
+    ranked = rank_feed([keys for keys, _ in page.items], [], "most_viewed")
+    encoded = {keys["_id"]: data for keys, data in page.items}
+    assert [json.loads(encoded[video["_id"]]) for video in ranked] == [
+        {"_id": "2" * 24, "title": "video 2"},
+        {"_id": "1" * 24, "title": "video 1"},
+        {"_id": "0" * 24, "title": "video 0"},
+    ]
@@ -0,0 +1,34 @@
+from database import database
+from typing import List
+
+# Hot query shapes that must never fall back to a collection scan
+HOT_QUERIES = [
+    ("users", {"email": "probe@example.com"}),
+    ("doctors", {"email": "probe@example.com"}),
+    ("accounts", {"email": "probe@example.com"}),
+    ("videos", {"uploaded_by": "probe"}),
+    ("videos", {"category": "probe"}),
+    ("videos", {"youtube_id": "probe"}),
+    ("watch_history", {"account_id": "probe"}),
+]
+
+def _plan_stages(plan: dict) -> List[str]:
+    stages = [plan.get("stage", "")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return stages
+
+async def find_collection_scans() -> List[str]:
+    """Explain every hot query and return the ones whose winning plan is a COLLSCAN."""
+    offenders = []
+    for collection_name, query in HOT_QUERIES:
+        explain = await database[collection_name].find(query).explain()
+        if "COLLSCAN" in _plan_stages(explain["queryPlanner"]["winningPlan"]):
+            offenders.append(f"{collection_name}: {query}")
+    return offenders
+
+def test_hot_queries_are_index_backed(run, mongo):
+    assert run(find_collection_scans()) == []
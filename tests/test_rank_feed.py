@@ -0,0 +1,23 @@
+from services.video_service import rank_feed
+
+def video(video_id, upload_date, **fields):
+    return {"_id": video_id, "upload_date": upload_date, **fields}
+
+PAGE = [video("a", "2024-03"), video("b", "2024-02"), video("c", "2024-01")]
+
+def test_watched_videos_lead_the_first_page_by_recency():
+    # "z" is watched but sits on a later catalog page; it still ranks first
+    watched = [video("z", "2023-01"), video("b", "2024-02")]
+    ranked = rank_feed(PAGE, watched, "newest")
+    assert [v["_id"] for v in ranked] == ["z", "b", "a", "c"]
+
+def test_watched_videos_are_left_out_of_later_pages():
+    watched = [video("b", "2024-02")]
+    ranked = rank_feed(PAGE, watched, "newest", first_page=False)
+    assert [v["_id"] for v in ranked] == ["a", "c"]
+
+def test_category_affinity_uses_the_watched_videos():
+    page = [video("a", "2024-03", category="fitness"), video("b", "2024-02", category="nutrition")]
+    watched = [video("z", "2023-01", category="nutrition")]
+    ranked = rank_feed(page, watched, "category_affinity", first_page=False)
+    assert [v["_id"] for v in ranked] == ["b", "a"]
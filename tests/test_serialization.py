@@ -0,0 +1,14 @@
+from bson import Decimal128, ObjectId
+from datetime import datetime
+from utils.serialization import FastJSONResponse, dumps
+import json
+
+def test_bson_types_are_encoded_natively():
+    video_id = ObjectId()
+    encoded = dumps({"_id": video_id, "rating": Decimal128("4.50"), "at": datetime(2024, 1, 2, 3, 4, 5), "title": "é"})
+    assert json.loads(encoded) == {"_id": str(video_id), "rating": "4.50", "at": "2024-01-02T03:04:05", "title": "é"}
+
+def test_response_renders_with_the_same_encoder():
+    response = FastJSONResponse({"videos": [{"_id": ObjectId("0" * 24)}]})
+    assert response.body == b'{"videos":[{"_id":"000000000000000000000000"}]}'
+    assert response.media_type == "application/json"
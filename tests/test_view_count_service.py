@@ -0,0 +1,60 @@
+from database import videos_collection, background_jobs_collection
+from datetime import datetime, timedelta
+from services import view_count_service
+import asyncio
+
+def insert_videos(run, count, prefix, hours_old, view_count_value=0):
+    refreshed_at = datetime.utcnow() - timedelta(hours=hours_old)
+    run(videos_collection.insert_many([
+        {"youtube_id": f"{prefix}{i:06d}", "stats_refreshed_at": refreshed_at, "view_count_value": view_count_value}
+        for i in range(count)
+    ]))
+
+def test_refresh_batches_50_ids_within_the_quota(run, mongo, youtube_stub, monkeypatch):
+    monkeypatch.setattr(view_count_service, "VIEW_REFRESH_QUOTA_PER_RUN", 2)
+    bulk_writes = []
+    bulk_write = videos_collection.bulk_write
+
+    async def recording_bulk_write(operations, **kwargs):
+        bulk_writes.append(len(operations))
+        return await bulk_write(operations, **kwargs)
+
+    monkeypatch.setattr(videos_collection, "bulk_write", recording_bulk_write)
+    insert_videos(run, 120, "old", hours_old=48)
+
+    refreshed = run(view_count_service.refresh_view_counts())
+
+    # Two calls allowed: 100 of the 120 due videos, 50 IDs and one bulk_write per call
+    assert [len(call) for call in youtube_stub.calls] == [50, 50]
+    assert bulk_writes == [50, 50]
+    assert refreshed == 100
+    assert run(videos_collection.count_documents({"view_count": "1234"})) == 100
+
+def test_popular_videos_are_not_starved_by_an_old_backlog(run, mongo, monkeypatch):
+    insert_videos(run, 200, "old", hours_old=48)
+    insert_videos(run, 10, "pop", hours_old=4, view_count_value=view_count_service.VIEW_REFRESH_POPULAR_VIEWS)
+
+    due = run(view_count_service.find_stale_videos(50))
+
+    assert len(due) == 50
+    assert sum(video["youtube_id"].startswith("pop") for video in due) == 10
+
+def test_refresher_stands_by_while_another_worker_holds_the_lease(run, mongo, youtube_stub):
+    insert_videos(run, 10, "old", hours_old=48)
+    later = datetime.utcnow() + timedelta(seconds=60)
+    run(background_jobs_collection.insert_one(
+        {"_id": view_count_service.VIEW_REFRESH_JOB, "owner": "other-worker", "lease_until": later}
+    ))
+
+    async def start_then_stop():
+        loop_task = asyncio.create_task(view_count_service._refresh_loop())
+        await asyncio.sleep(0.5)
+        loop_task.cancel()
+        try:
+            await loop_task
+        except asyncio.CancelledError:
+            pass
+
+    run(start_then_stop())
+    # Only the lease holder spends quota
+    assert youtube_stub.calls == []
@@ -0,0 +1,75 @@
+from bson import ObjectId
+from database import watch_history_collection, versions_collection
+from services.history_service import make_entry, record_watch_event, recent_watch_history, WATCH_HISTORY_LIMIT
+from services.version_service import history_version_key
+from datetime import datetime
+import asyncio
+
+WRITERS = 100
+
+def test_parallel_writers_lose_no_updates(run, mongo):
+    account_id = str(ObjectId())
+    video_ids = [f"video-{i:03d}" for i in range(WRITERS)]
+
+    async def write_all():
+        await asyncio.gather(*(record_watch_event(account_id, video_id) for video_id in video_ids))
+
+    run(write_all())
+
+    buckets = run(watch_history_collection.find({"account_id": ObjectId(account_id)}).to_list(None))
+    stored = [entry["v"] for bucket in buckets for entry in bucket["entries"]]
+    assert sorted(stored) == video_ids
+    assert sum(bucket["count"] for bucket in buckets) == WRITERS
+
+    counter = run(versions_collection.find_one({"_id": history_version_key(account_id)}))
+    assert counter["version"] == WRITERS
+
+    history = run(recent_watch_history(account_id))
+    assert len(history) == WATCH_HISTORY_LIMIT
+    assert len({entry["video_id"] for entry in history}) == WATCH_HISTORY_LIMIT
+
+def test_parallel_writes_of_one_video_dedupe_on_read(run, mongo):
+    account_id = str(ObjectId())
+
+    async def write_all():
+        await asyncio.gather(*(record_watch_event(account_id, "same-video", float(i)) for i in range(WRITERS)))
+        await record_watch_event(account_id, "newest-video")
+
+    run(write_all())
+
+    history = run(recent_watch_history(account_id))
+    assert [entry["video_id"] for entry in history] == ["newest-video", "same-video"]
+
+def test_split_day_buckets_read_in_watch_order(run, mongo):
+    # Two buckets for one day, as racing first writes leave them, with the newer entries in the older _id
+    account_id = ObjectId()
+    day = datetime(2024, 5, 1)
+    first, second = ObjectId(), ObjectId()
+    run(watch_history_collection.insert_many([
+        {"_id": first, "account_id": account_id, "bucket": day, "count": 2,
+         "entries": [make_entry("b", day.replace(hour=2)), make_entry("d", day.replace(hour=4))]},
+        {"_id": second, "account_id": account_id, "bucket": day, "count": 2,
+         "entries": [make_entry("a", day.replace(hour=1)), make_entry("c", day.replace(hour=3))]},
+    ]))
+
+    history = run(recent_watch_history(str(account_id)))
+    assert [entry["video_id"] for entry in history] == ["d", "c", "b", "a"]
+
+def test_shutdown_drains_buffered_events(run, mongo, monkeypatch):
+    from services import history_service
+    monkeypatch.setattr(history_service, "WRITE_BEHIND_ENABLED", True)
+    account_id = str(ObjectId())
+
+    async def buffer_then_stop():
+        history_service.start_history_writer()
+        await asyncio.gather(*(record_watch_event(account_id, f"video-{i:03d}") for i in range(WRITERS)))
+        # Let the flusher pick up a batch so shutdown lands while it may be mid-write
+        history_service._flush_wakeup.set()
+        await asyncio.sleep(0)
+        await history_service.stop_history_writer()
+
+    run(buffer_then_stop())
+
+    buckets = run(watch_history_collection.find({"account_id": ObjectId(account_id)}).to_list(None))
+    assert sum(bucket["count"] for bucket in buckets) == WRITERS
+    assert history_service.write_behind_stats()["pending"] == 0
@@ -0,0 +1,57 @@
+from services import youtube_service
+from services.youtube_service import fetch_video_items_batched
+import asyncio
+import time
+
+def video_ids(count):
+    return [f"vid{i:08d}" for i in range(count)]
+
+def test_batched_fetch_uses_50_ids_per_call(run, youtube_stub):
+    ids = video_ids(120)
+    items, failed = run(fetch_video_items_batched(ids))
+    assert sorted(len(call) for call in youtube_stub.calls) == [20, 50, 50]
+    assert set(items) == set(ids)
+    assert failed == []
+
+def test_failed_chunks_are_reported_apart_from_unknown_ids(run, youtube_stub):
+    ids = video_ids(60)
+    youtube_stub.fail_ids = {ids[0]}
+    youtube_stub.unknown_ids = {ids[55]}
+    items, failed = run(fetch_video_items_batched(ids))
+    # The first chunk failed as a whole; the unknown ID in the second is simply absent
+    assert failed == ids[:50]
+    assert set(items) == set(ids[50:]) - {ids[55]}
+
+def reset_metadata_cache():
+    youtube_service._metadata_cache.clear()
+    youtube_service._metadata_inflight.clear()
+
+def test_concurrent_lookups_of_one_video_make_one_upstream_call(run, mongo, youtube_stub):
+    reset_metadata_cache()
+
+    async def lookup_50():
+        return await asyncio.gather(*(youtube_service.get_video_metadata("vid00000001") for _ in range(50)))
+
+    results = run(lookup_50())
+    assert youtube_stub.calls == [["vid00000001"]]
+    assert all(metadata["title"] == "Video vid00000001" for metadata in results)
+
+def test_stale_metadata_is_served_while_one_refresh_runs(run, mongo, youtube_stub):
+    reset_metadata_cache()
+    stale = {"title": "Old title", "view_count": "1"}
+    youtube_service._metadata_cache["vid00000002"] = {
+        "metadata": stale,
+        "fetched_at": time.time() - youtube_service.METADATA_FRESH_SECONDS - 1,
+    }
+
+    async def lookup_then_settle():
+        results = await asyncio.gather(*(youtube_service.get_video_metadata("vid00000002") for _ in range(10)))
+        await asyncio.gather(*list(youtube_service._metadata_inflight.values()))
+        return results
+
+    results = run(lookup_then_settle())
+    # Every caller got the stale entry at once, and only one background refresh went upstream
+    assert all(metadata == stale for metadata in results)
+    assert youtube_stub.calls == [["vid00000002"]]
+    assert run(youtube_service.get_video_metadata("vid00000002"))["title"] == "Video vid00000002"
+    assert len(youtube_stub.calls) == 1
@@ -1,5 +1,9 @@
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import TLRUCache
+import asyncio
+import time
 import jwt
 import os
 from dotenv import load_dotenv
@@ -36,6 +40,54 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify that the given plain password matches the hashed password."""
     return pwd_context.verify(plain_password, hashed_password)
 
+# bcrypt is deliberately slow, so it runs on a dedicated, size-limited pool instead of
+# the event loop (or anyio's shared threadpool, which every sync dependency also uses)
+HASH_POOL_SIZE = int(os.getenv("HASH_POOL_SIZE", "4"))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "32"))
+
+_hash_executor = ThreadPoolExecutor(max_workers=HASH_POOL_SIZE, thread_name_prefix="bcrypt")
+_hash_in_flight = 0
+_hash_stats = {"completed": 0, "rejected": 0, "max_queue_depth": 0}
+
+async def _run_in_hash_pool(func, *args):
+    """Run a bcrypt call on the hash pool, failing fast with 503 when it is saturated."""
+    global _hash_in_flight
+    queue_depth = max(0, _hash_in_flight - HASH_POOL_SIZE)
+    if queue_depth >= HASH_QUEUE_LIMIT:
+        _hash_stats["rejected"] += 1
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+    _hash_in_flight += 1
+    _hash_stats["max_queue_depth"] = max(_hash_stats["max_queue_depth"], queue_depth + 1)
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_executor, func, *args)
+    finally:
+        _hash_in_flight -= 1
+        _hash_stats["completed"] += 1
+
+async def hash_password_async(password: str) -> str:
+    """Hash the given password on the bcrypt worker pool."""
+    return await _run_in_hash_pool(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash on the bcrypt worker pool."""
+    return await _run_in_hash_pool(verify_password, plain_password, hashed_password)
+
+def hash_pool_stats() -> dict:
+    """Snapshot of the bcrypt pool for the metrics endpoint."""
+    return {
+        "pool_size": HASH_POOL_SIZE,
+        "queue_limit": HASH_QUEUE_LIMIT,
+        "in_flight": _hash_in_flight,
+        "queue_depth": max(0, _hash_in_flight - HASH_POOL_SIZE),
+        **_hash_stats,
+    }
+
 def create_jwt_token(data: dict, expires_delta: timedelta):
     to_encode = data.copy()
     expire = datetime.utcnow() + expires_delta
@@ -68,18 +120,35 @@ def verify_token(token: str):
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+# Verified claims keyed by raw token; each entry expires at the token's own `exp`
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+_token_cache = TLRUCache(maxsize=TOKEN_CACHE_SIZE, ttu=lambda token, claims, now: claims["exp"], timer=time.time)
+_token_cache_stats = {"hits": 0, "misses": 0}
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    """Resolve the bearer token to the current user without leaving the event loop."""
+    claims = _token_cache.get(token)
+    if claims is not None:
+        _token_cache_stats["hits"] += 1
+        return {"user_id": claims["user_id"], "role": claims["role"]}
+
+    _token_cache_stats["misses"] += 1
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        print("Token decoded successfully:", payload)  # ✅ Debugging log
-        return {"user_id": payload["user_id"], "role": payload["role"]}
+        claims = {"user_id": payload["user_id"], "role": payload["role"], "exp": payload["exp"]}
     except jwt.ExpiredSignatureError:
-        print("Token expired!")  # ✅ Debugging log
         raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.InvalidTokenError:
-        print("Invalid token!")  # ✅ Debugging log
+    except (jwt.InvalidTokenError, KeyError):
         raise HTTPException(status_code=401, detail="Invalid token")
 
+    _token_cache[token] = claims
+    return {"user_id": claims["user_id"], "role": claims["role"]}
+
+def token_cache_stats() -> dict:
+    """Snapshot of the decoded-token cache for the metrics endpoint."""
+    return {"size": len(_token_cache), "max_size": TOKEN_CACHE_SIZE, **_token_cache_stats}
+
 def check_role(user_role: str, required_role: str):
     """Check if the user has the required role to perform an action."""
     if user_role != required_role:
@@ -0,0 +1,41 @@
+from fastapi.responses import JSONResponse
+from bson import Decimal128, ObjectId
+from datetime import date, datetime
+from typing import Any
+import json
+
+# orjson is much faster on large lists; fall back to the stdlib encoder when it is not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _default(value: Any) -> Any:
+    """Encode the BSON and date types Mongo documents carry."""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        # As a string so no precision is lost on the way to the client
+        return str(value.to_decimal())
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON for API responses and cached payloads."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+    ).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse that encodes ObjectId, datetime and Decimal128 values itself.
+
+    Returning it directly from a handler also skips FastAPI's `jsonable_encoder` pass.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)